@@ -1,6 +1,14 @@
 // Enterprise Audit Trail Dashboard JavaScript - Version 2.0
 // Production-ready with WebSocket support and new backend API
 
+// /api/search entity type behind each search box. The dashboard has one box
+// per entity type, so each keystroke sends one request scoped with types=
+const SEARCH_TYPES = {
+    doctor: 'user',
+    device: 'device',
+    patient: 'patient',
+};
+
 class EnterpriseAuditDashboard {
     constructor() {
         // Configuration - Use current URL protocol and host (Railway uses HTTPS without port)
@@ -37,6 +45,9 @@ class EnterpriseAuditDashboard {
         this.devices = [];
         this.patients = [];
         
+        // In-flight search request per search box
+        this.searchControllers = {};
+        
         // Charts
         this.charts = {};
         
@@ -100,8 +111,11 @@ class EnterpriseAuditDashboard {
                 console.log('✅ WebSocket connected');
                 this.updateConnectionStatus(true);
                 
-                // Subscribe to logs
-                this.socket.emit('subscribe_logs', {});
+                // Subscribe to logs; after a reconnect the server replays what we missed
+                const lastSeen = this.logs.length ? this.logs[0] : null;
+                this.socket.emit('subscribe_logs', lastSeen
+                    ? { last_seen_id: lastSeen.id, last_seen_timestamp: lastSeen.timestamp }
+                    : {});
             });
             
             this.socket.on('disconnect', () => {
@@ -114,6 +128,20 @@ class EnterpriseAuditDashboard {
                 this.handleNewLog(logData);
             });
             
+            // The server waits for the ack before sending the next batch
+            this.socket.on('new_logs', (logs, ack) => {
+                console.log('📨 New logs received:', logs.length);
+                this.handleNewLogs(logs);
+                if (ack) ack();
+            });
+            
+            this.socket.on('logs_skipped', (info, ack) => {
+                // skipped is null when the server lost our replay position
+                console.warn(`⚠️ ${info.skipped ?? 'Unknown number of'} live logs skipped, resyncing`);
+                if (ack) ack();
+                this.refreshData();
+            });
+            
             this.socket.on('connection_established', (data) => {
                 console.log('Connection established:', data);
             });
@@ -140,24 +168,34 @@ class EnterpriseAuditDashboard {
     }
 
     handleNewLog(logData) {
-        // Add to logs array
-        this.logs.unshift(logData);
+        this.handleNewLogs([logData]);
+    }
+
+    handleNewLogs(logs) {
+        // Batches arrive oldest first; newest log ends up at the front
+        for (const logData of logs) {
+            // Replayed logs can overlap what we already have
+            if (this.logs.some(log => log.id === logData.id)) {
+                continue;
+            }
+            this.logs.unshift(logData);
+            
+            // Update filtered logs if matches current filter
+            if (this.selectedHospital === 'all' || logData.hospital_id === this.selectedHospital) {
+                this.filteredLogs.unshift(logData);
+            }
+        }
         
         // Keep only last 500
         if (this.logs.length > 500) {
             this.logs = this.logs.slice(0, 500);
         }
         
-        // Update filtered logs if matches current filter
-        if (this.selectedHospital === 'all' || logData.hospital_id === this.selectedHospital) {
-            this.filteredLogs.unshift(logData);
-            
-            if (this.filteredLogs.length > 200) {
-                this.filteredLogs = this.filteredLogs.slice(0, 200);
-            }
+        if (this.filteredLogs.length > 200) {
+            this.filteredLogs = this.filteredLogs.slice(0, 200);
         }
         
-        // Update UI
+        // Update UI once per batch
         this.updateStats();
         this.renderRecentActivity();
         this.renderLogEntries();
@@ -240,35 +278,16 @@ class EnterpriseAuditDashboard {
     }
 
     initializeSearch() {
-        // Doctor search
-        const doctorSearch = document.getElementById('doctor-search');
-        if (doctorSearch) {
-            let debounceTimer;
-            doctorSearch.addEventListener('input', (e) => {
-                clearTimeout(debounceTimer);
-                debounceTimer = setTimeout(() => this.searchDoctors(e.target.value), 300);
-            });
-        }
-
-        // Device search
-        const deviceSearch = document.getElementById('device-search');
-        if (deviceSearch) {
+        // Doctor, device and patient search boxes
+        ['doctor', 'device', 'patient'].forEach(type => {
+            const input = document.getElementById(`${type}-search`);
+            if (!input) return;
             let debounceTimer;
-            deviceSearch.addEventListener('input', (e) => {
+            input.addEventListener('input', (e) => {
                 clearTimeout(debounceTimer);
-                debounceTimer = setTimeout(() => this.searchDevices(e.target.value), 300);
+                debounceTimer = setTimeout(() => this.searchEntities(type, e.target.value), 300);
             });
-        }
-
-        // Patient search
-        const patientSearch = document.getElementById('patient-search');
-        if (patientSearch) {
-            let debounceTimer;
-            patientSearch.addEventListener('input', (e) => {
-                clearTimeout(debounceTimer);
-                debounceTimer = setTimeout(() => this.searchPatients(e.target.value), 300);
-            });
-        }
+        });
 
         // Date range
         const startDate = document.getElementById('start-date');
@@ -296,7 +315,9 @@ class EnterpriseAuditDashboard {
             
             return await response.json();
         } catch (error) {
-            console.error(`API call failed for ${endpoint}:`, error);
+            if (error.name !== 'AbortError') {
+                console.error(`API call failed for ${endpoint}:`, error);
+            }
             throw error;
         }
     }
@@ -399,45 +420,30 @@ class EnterpriseAuditDashboard {
 
     // ===== SEARCH =====
 
-    async searchDoctors(query) {
-        if (!query.trim()) {
-            document.getElementById('doctor-results').innerHTML = '';
-            return;
-        }
+    async searchEntities(type, query) {
+        // A newer query replaces the one still in flight for this box
+        this.searchControllers[type]?.abort();
 
-        try {
-            const results = await this.fetchAPI(`/search/doctors?q=${encodeURIComponent(query)}`);
-            this.renderSearchResults('doctor-results', results, 'doctor');
-        } catch (error) {
-            console.error('Search doctors failed:', error);
-        }
-    }
-
-    async searchDevices(query) {
         if (!query.trim()) {
-            document.getElementById('device-results').innerHTML = '';
+            document.getElementById(`${type}-results`).innerHTML = '';
             return;
         }
 
-        try {
-            const results = await this.fetchAPI(`/search/devices?q=${encodeURIComponent(query)}`);
-            this.renderSearchResults('device-results', results, 'device');
-        } catch (error) {
-            console.error('Search devices failed:', error);
-        }
-    }
-
-    async searchPatients(query) {
-        if (!query.trim()) {
-            document.getElementById('patient-results').innerHTML = '';
-            return;
-        }
+        const controller = new AbortController();
+        this.searchControllers[type] = controller;
+        const params = new URLSearchParams({
+            q: query,
+            types: SEARCH_TYPES[type],
+            limit: '20',
+        });
 
         try {
-            const results = await this.fetchAPI(`/search/patients?q=${encodeURIComponent(query)}`);
-            this.renderSearchResults('patient-results', results, 'patient');
+            const response = await this.fetchAPI(`/search?${params.toString()}`, { signal: controller.signal });
+            this.renderSearchResults(`${type}-results`, response.results.map(result => result.item), type);
         } catch (error) {
-            console.error('Search patients failed:', error);
+            if (error.name !== 'AbortError') {
+                console.error(`Search ${type}s failed:`, error);
+            }
         }
     }
 
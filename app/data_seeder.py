@@ -2,12 +2,18 @@
 Data seeder for initial data and background generation
 """
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import random
+import time
 import asyncio
 from apscheduler.schedulers.background import BackgroundScheduler
-from typing import List
+from faker import Faker
+from typing import Dict, Iterator, List, Optional
 
 from .models import Hospital, User, Device, Patient, AuditLog
 from .generators import (
@@ -18,6 +24,9 @@ from .generators import (
     WorkflowPatterns
 )
 from .config import settings
+from .services.entity_snapshot import entity_cache
+from .services.log_broadcaster import log_broadcaster
+from .services.rollup_service import RollupService
 from .utils.logging import get_logger
 from .database import SessionLocal
 
@@ -72,6 +81,12 @@ DEVICE_TYPES = [
 ]
 
 
+def seed_generators(seed):
+    """Seed `random` and the shared Faker generator used by the entity generators"""
+    random.seed(seed)
+    Faker.seed(seed)
+
+
 def seed_hospitals(db: Session):
     """Seed hospitals"""
     logger.info("Seeding hospitals...")
@@ -165,68 +180,190 @@ def seed_patients(db: Session):
     logger.info(f"Seeded {total_patients} patients")
 
 
-def seed_historical_logs(db: Session, days: int = 7):
-    """Seed historical audit logs"""
-    logger.info(f"Generating {days} days of historical logs...")
+def plan_daily_volumes(days: int, target_rows: Optional[int] = None) -> List[int]:
+    """
+    Number of events to generate for each day
     
-    # Get all entities
-    hospitals = db.query(Hospital).all()
-    users = db.query(User).all()
-    devices = db.query(Device).all()
-    patients = db.query(Patient).all()
+    Without a target every day gets 50-200 events; with one the target is
+    spread evenly across the days.
+    """
+    if days < 1:
+        raise ValueError(f"days must be at least 1, got {days}")
     
-    if not all([hospitals, users, devices, patients]):
-        logger.warning("Missing entities for log generation")
+    if target_rows is None:
+        return [random.randint(50, 200) for _ in range(days)]
+    
+    per_day, remainder = divmod(target_rows, days)
+    return [per_day + (1 if day < remainder else 0) for day in range(days)]
+
+
+def generate_day_logs(base_date: datetime, count: int, entities: Dict[str, List[Dict]]) -> Iterator[Dict]:
+    """Yield `count` audit log rows on the day of base_date"""
+    for _ in range(count):
+        event_data = EventGenerator.generate_random_event(
+            users=entities["users"],
+            patients=entities["patients"],
+            devices=entities["devices"],
+            hospitals=entities["hospitals"]
+        )
+        
+        # Adjust timestamp to historical date
+        event_data["timestamp"] = TimePatterns.get_realistic_timestamp(base_date)
+        yield event_data
+
+
+def insert_log_batch(db: Session, rows: List[Dict]):
+    """
+    Write audit log rows with one executemany insert and commit
+    
+    Core inserts bypass the ORM flush hook, so the hourly rollup is
+    incremented here in the same transaction.
+    """
+    if not rows:
         return
     
-    # Convert to dicts for generator (include clinic from device_metadata)
-    hospital_dicts = [{"id": h.id, "name": h.name} for h in hospitals]
-    user_dicts = [{"id": u.id, "name": u.name} for u in users]
-    device_dicts = [
-        {
-            "id": d.id, 
-            "name": d.name, 
-            "type": d.type,
-            "clinic": d.device_metadata.get("clinic") if d.device_metadata else None
-        } 
-        for d in devices
-    ]
-    patient_dicts = [{"id": p.id, "name": p.name} for p in patients]
+    connection = db.connection()
+    connection.execute(insert(AuditLog.__table__), rows)
+    RollupService.apply(connection, RollupService.aggregate(rows))
+    db.commit()
+
+
+# Entities shared by the generator processes, set by _init_generator_worker
+_worker_entities: Optional[Dict[str, List[Dict]]] = None
+
+
+def _init_generator_worker(entities: Dict[str, List[Dict]]):
+    """Process pool initializer: receive the entity dicts once per worker"""
+    global _worker_entities
+    _worker_entities = entities
+
+
+def _generate_log_chunk(base_date: datetime, count: int, seed: str) -> List[Dict]:
+    """Generate one chunk of a day's logs in a worker with its own seed"""
+    seed_generators(seed)
+    return list(generate_day_logs(base_date, count, _worker_entities))
+
+
+def _log_progress(total_logs: int, expected: int, started: float):
+    """Log seeding progress and throughput"""
+    elapsed = max(time.monotonic() - started, 1e-9)
+    logger.info(
+        f"Generated {total_logs}/{expected} historical logs "
+        f"({total_logs / expected:.0%}, {total_logs / elapsed:.0f} rows/s)"
+    )
+
+
+def seed_historical_logs(
+    db: Session,
+    days: int = 7,
+    target_rows: Optional[int] = None,
+    batch_size: int = 5000,
+    workers: int = 1,
+    seed: Optional[int] = None
+) -> int:
+    """
+    Seed historical audit logs
+    
+    Rows are generated as plain dicts and bulk inserted batch_size at a
+    time. Pass target_rows to build a load-test dataset of a given size.
+    With workers > 1 each day is split into batch_size chunks generated in
+    a process pool, each chunk with its own seed derived from `seed`, and
+    this process writes the chunks as they come back.
+    The same seed and workers reproduce the same event content and ids
+    given the same entities; timestamps and the date prefix of accession
+    and HL7 ids still follow the wall clock of the run.
+    Returns the number of logs written.
+    """
+    logger.info(f"Generating {days} days of historical logs...")
+    
+    snapshot = entity_cache.get(db)
+    if snapshot is None:
+        logger.warning("Missing entities for log generation")
+        return 0
+    entities = snapshot.entities
+    
+    if seed is not None:
+        seed_generators(seed)
+    
+    volumes = plan_daily_volumes(days, target_rows)
+    expected = sum(volumes)
+    now = datetime.utcnow()
+    started = time.monotonic()
+    
+    if workers > 1:
+        total_logs = _seed_logs_parallel(db, volumes, now, entities, batch_size, workers, seed, expected, started)
+        logger.info(f"Seeded {total_logs} historical audit logs in {time.monotonic() - started:.1f}s")
+        return total_logs
     
     total_logs = 0
+    batch = []
     
     # Generate logs for each day
-    for day in range(days):
-        date_offset = timedelta(days=days - day - 1)
-        base_date = datetime.utcnow() - date_offset
-        
-        # Generate 50-200 events per day (distributed by peak hours)
-        events_per_day = random.randint(50, 200)
+    for day, count in enumerate(volumes):
+        base_date = now - timedelta(days=days - day - 1)
         
-        for _ in range(events_per_day):
-            # Generate random event
-            event_data = EventGenerator.generate_random_event(
-                users=user_dicts,
-                patients=patient_dicts,
-                devices=device_dicts,
-                hospitals=hospital_dicts
-            )
-            
-            # Adjust timestamp to historical date
-            event_data["timestamp"] = TimePatterns.get_realistic_timestamp(base_date)
+        for event_data in generate_day_logs(base_date, count, entities):
+            batch.append(event_data)
             
-            # Create audit log
-            log = AuditLog(**event_data)
-            db.add(log)
-            total_logs += 1
+            if len(batch) >= batch_size:
+                insert_log_batch(db, batch)
+                total_logs += len(batch)
+                batch = []
+                _log_progress(total_logs, expected, started)
+    
+    insert_log_batch(db, batch)
+    total_logs += len(batch)
+    
+    logger.info(f"Seeded {total_logs} historical audit logs in {time.monotonic() - started:.1f}s")
+    return total_logs
+
+
+def _seed_logs_parallel(
+    db: Session,
+    volumes: List[int],
+    now: datetime,
+    entities: Dict[str, List[Dict]],
+    batch_size: int,
+    workers: int,
+    seed: Optional[int],
+    expected: int,
+    started: float
+) -> int:
+    """Generate log chunks in a process pool and write them from this process"""
+    days = len(volumes)
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    
+    tasks = []
+    for day, count in enumerate(volumes):
+        base_date = now - timedelta(days=days - day - 1)
+        for chunk, offset in enumerate(range(0, count, batch_size)):
+            tasks.append((base_date, min(batch_size, count - offset), f"{seed}-{day}-{chunk}"))
+    
+    total_logs = 0
+    pending = deque()
+    task_iter = iter(tasks)
+    
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_generator_worker,
+        initargs=(entities,)
+    ) as executor:
+        # Keep a bounded number of chunks in flight so memory stays flat
+        for task in islice(task_iter, workers * 2):
+            pending.append(executor.submit(_generate_log_chunk, *task))
+        
+        while pending:
+            rows = pending.popleft().result()
+            task = next(task_iter, None)
+            if task is not None:
+                pending.append(executor.submit(_generate_log_chunk, *task))
             
-            # Commit in batches
-            if total_logs % 100 == 0:
-                db.commit()
-                logger.info(f"Generated {total_logs} historical logs...")
+            insert_log_batch(db, rows)
+            total_logs += len(rows)
+            _log_progress(total_logs, expected, started)
     
-    db.commit()
-    logger.info(f"Seeded {total_logs} historical audit logs")
+    return total_logs
 
 
 def seed_initial_data(db: Session):
@@ -237,7 +374,13 @@ def seed_initial_data(db: Session):
     seed_users(db)
     seed_devices(db)
     seed_patients(db)
-    seed_historical_logs(db, days=settings.HISTORICAL_DATA_DAYS if settings.HISTORICAL_DATA_DAYS < 30 else 7)
+    seed_historical_logs(
+        db,
+        days=settings.HISTORICAL_DATA_DAYS if settings.HISTORICAL_DATA_DAYS < 30 else 7,
+        target_rows=settings.HISTORICAL_DATA_ROWS,
+        batch_size=settings.SEED_BATCH_SIZE,
+        workers=settings.SEED_WORKERS
+    )
     
     logger.info("Initial data seeding completed")
 
@@ -247,32 +390,26 @@ scheduler = BackgroundScheduler()
 
 
 def generate_realtime_event():
-    """Generate a single real-time event (called by scheduler)"""
+    """
+    Generate a single real-time event (called by scheduler)
+    
+    Entities come from the shared snapshot, so a tick only inserts the log.
+    """
     db = SessionLocal()
     try:
-        # Get entities
-        hospitals = db.query(Hospital).all()
-        users = db.query(User).all()
-        devices = db.query(Device).all()
-        patients = db.query(Patient).all()
-        
-        if not all([hospitals, users, devices, patients]):
+        snapshot = entity_cache.get(db)
+        if snapshot is None:
             return
-        
-        # Convert to dicts
-        hospital_dicts = [{"id": h.id, "name": h.name} for h in hospitals]
-        user_dicts = [{"id": u.id, "name": u.name} for u in users]
-        device_dicts = [{"id": d.id, "name": d.name, "type": d.type} for d in devices]
-        patient_dicts = [{"id": p.id, "name": p.name} for p in patients]
+        entities = snapshot.entities
         
         # Check if should generate based on time patterns
         if TimePatterns.should_generate_now() or random.random() > 0.5:
             # Generate event
             event_data = EventGenerator.generate_random_event(
-                users=user_dicts,
-                patients=patient_dicts,
-                devices=device_dicts,
-                hospitals=hospital_dicts
+                users=entities["users"],
+                patients=entities["patients"],
+                devices=entities["devices"],
+                hospitals=entities["hospitals"]
             )
             
             # Save to database
@@ -282,8 +419,7 @@ def generate_realtime_event():
             
             logger.debug(f"Generated real-time event: {event_data['event_type']}")
             
-            # TODO: Broadcast via WebSocket
-            # await broadcast_new_log(event_data)
+            log_broadcaster.publish(event_data)
     
     except Exception as e:
         logger.error(f"Error generating real-time event: {e}")
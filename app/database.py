@@ -2,38 +2,125 @@
 Database configuration and session management
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
 from .config import settings
+from .utils.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, register_engine
+from datetime import datetime, timedelta
 from pathlib import Path
 
 # Ensure data directory exists
 data_dir = Path("./data")
 data_dir.mkdir(exist_ok=True)
 
+is_sqlite = settings.DATABASE_URL.startswith("sqlite")
+audit_logs_partitioned = settings.AUDIT_LOG_PARTITIONING and not is_sqlite
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Per-connection SQLite tuning: WAL lets readers run alongside the writer"""
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+
 # Create engine
-if settings.DATABASE_URL.startswith("sqlite"):
-    # SQLite specific configuration
+if is_sqlite:
+    # SQLite allows one writer at a time; a single pooled connection makes
+    # the seeder, generator and maintenance commands take turns in-process
+    # instead of failing with "database is locked"
     engine = create_engine(
         settings.DATABASE_URL,
         connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.SQLITE_WRITER_TIMEOUT,
+        echo=settings.DEBUG
+    )
+    # Separate pool for sync readers (export streams, replay) so they don't
+    # queue behind the writer connection
+    read_engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=0,
         echo=settings.DEBUG
     )
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(read_engine, "connect", _set_sqlite_pragmas)
 else:
     # PostgreSQL configuration
     engine = create_engine(
         settings.DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
         pool_pre_ping=True,
-        pool_size=10,
-        max_overflow=20,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        # No statement_timeout here: manage.py maintenance (index builds,
+        # partition attach, backfills, archiving) runs on this engine
         echo=settings.DEBUG
     )
+    read_engine = engine
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL to its async driver (aiosqlite / asyncpg)"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    for prefix in ("postgresql://", "postgres://", "postgresql+psycopg2://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+# Async engine for the API routers, so queries don't block the event loop
+# that also serves Socket.IO
+if is_sqlite:
+    async_engine = create_async_engine(
+        get_async_database_url(settings.DATABASE_URL),
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.SQLITE_READ_POOL_SIZE,
+        max_overflow=0,
+        echo=settings.DEBUG
+    )
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+else:
+    async_engine = create_async_engine(
+        get_async_database_url(settings.DATABASE_URL),
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args=(
+            {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+            if settings.DB_STATEMENT_TIMEOUT_MS else {}
+        ),
+        echo=settings.DEBUG
+    )
+
+register_engine("sync", engine)
+if read_engine is not engine:
+    register_engine("sync_read", read_engine)
+register_engine("async", async_engine)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
@@ -48,8 +135,23 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for getting an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """Initialize database tables"""
-    from .models import audit, hospital, user, device, patient  # noqa
+    from .models import audit, hospital, user, device, patient, rollup, search  # noqa
     Base.metadata.create_all(bind=engine)
+    
+    # create_all() does not add columns to existing tables
+    from .migrations import add_promoted_detail_columns
+    add_promoted_detail_columns(engine)
+    
+    if audit_logs_partitioned:
+        from .services.partition_service import PartitionService
+        since = datetime.utcnow() - timedelta(days=settings.HISTORICAL_DATA_DAYS)
+        PartitionService.ensure_partitions(engine, since=since)
 
@@ -104,9 +104,8 @@ class DoctorGenerator:
             first = first.lower()
             last = last.lower()
             
-            # Add UUID-based unique identifier for guaranteed uniqueness
-            import uuid
-            unique_id = str(uuid.uuid4().hex)[:8]
+            # Add a random hex suffix for uniqueness, drawn from `random` so seeded runs repeat it
+            unique_id = f"{random.getrandbits(32):08x}"
             
             return f"{first}.{last}.{unique_id}@{hospital_code}.saglik.gov.tr"
         
@@ -198,6 +198,11 @@ class EventGenerator:
             # External (for security events)
             return f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
     
+    @staticmethod
+    def generate_uuid() -> uuid.UUID:
+        """Random version 4 UUID drawn from `random`, so a seeded run repeats it"""
+        return uuid.UUID(int=random.getrandbits(128), version=4)
+    
     @staticmethod
     def generate_accession_number() -> str:
         """Generate DICOM Accession Number (0008,0050)"""
@@ -342,7 +347,7 @@ class EventGenerator:
         }
         
         return {
-            "id": str(uuid.uuid4()),
+            "id": str(EventGenerator.generate_uuid()),
             "timestamp": timestamp,
             "level": level,
             "event_type": event_type,
@@ -503,6 +508,6 @@ class EventGenerator:
             device_id=device.get("id") if device else None,
             device_clinic=device_clinic,
             hospital_id=hospital.get("id"),
-            filename=f"report_{uuid.uuid4().hex[:8]}.pdf" if event_type in ["FILE_UPLOAD", "FILE_DOWNLOAD"] else None
+            filename=f"report_{EventGenerator.generate_uuid().hex[:8]}.pdf" if event_type in ["FILE_UPLOAD", "FILE_DOWNLOAD"] else None
         )
 
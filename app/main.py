@@ -6,16 +6,31 @@ Production-ready backend with realistic data generation
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Optional
+import asyncio
 import socketio
 from pathlib import Path
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
 
 from .config import settings
-from .database import init_db, get_db, SessionLocal
+from .database import audit_logs_partitioned, engine, init_db, get_db, SessionLocal
 from .routers import auth_router, logs_router, analytics_router, search_router
 from .utils.logging import setup_logging, get_logger
-from .data_seeder import seed_initial_data, start_background_generator
+from .utils.pool_metrics import PoolCollector, pool_stats
+from .data_seeder import scheduler, seed_initial_data, start_background_generator
+from .services.log_broadcaster import log_broadcaster
+from .services.subscriptions import subscriptions, LogFilter, InvalidSubscriptionError
+from .services.outbound import outbound_queues
+from .services.replay import replay_buffer, replay_from_database
+from .services.partition_service import PartitionService
+from .services.retention_service import RetentionService
+from .services.cold_storage import cold_storage
+from .services.search_service import SearchService
+from .services.log_search import LogSearchService
+from .services.typeahead import typeahead_index
 
 # Setup logging
 setup_logging()
@@ -46,20 +61,77 @@ async def lifespan(app: FastAPI):
     try:
         seed_initial_data(db)
         logger.info("Initial data seeded")
+        SearchService.ensure_built(db)
+        LogSearchService.ensure_built(db.connection())
+        db.commit()
+        if settings.SEARCH_BACKEND == "memory":
+            typeahead_index.load(db)
     finally:
         db.close()
     
+    # Emit generated logs to Socket.IO subscribers in micro-batches
+    outbound_queues.start(send_to_subscriber, sio.disconnect)
+    log_broadcaster.start(broadcast_new_logs)
+    
     # Start background data generator
     if settings.GENERATE_REALISTIC_DATA:
         start_background_generator()
         logger.info("Background data generator started")
     
+    # Keep upcoming audit_logs partitions ready and drop expired ones
+    if audit_logs_partitioned:
+        scheduler.add_job(
+            PartitionService.maintain,
+            'interval',
+            hours=1,
+            args=[engine],
+            id='maintain_partitions',
+            replace_existing=True
+        )
+    
+    # Archive and delete audit logs past their retention window
+    if settings.RETENTION_ENABLED:
+        scheduler.add_job(
+            RetentionService.run,
+            'interval',
+            seconds=settings.RETENTION_INTERVAL,
+            id='apply_retention',
+            replace_existing=True
+        )
+    
+    # Move logs past the hot window to the Parquet cold storage tier
+    if settings.COLD_STORAGE_AFTER_DAYS is not None:
+        scheduler.add_job(
+            cold_storage.run,
+            'interval',
+            hours=1,
+            id='archive_cold_storage',
+            replace_existing=True
+        )
+    
+    # Pick up entity changes made by other worker processes
+    if settings.SEARCH_BACKEND == "memory":
+        scheduler.add_job(
+            typeahead_index.refresh,
+            'interval',
+            seconds=settings.SEARCH_INDEX_REFRESH_INTERVAL,
+            id='refresh_typeahead_index',
+            replace_existing=True
+        )
+    
+    if scheduler.get_jobs() and not scheduler.running:
+        scheduler.start()
+    
     logger.info(f"Server started on {settings.HOST}:{settings.PORT}")
     
     yield
     
     # Shutdown
     logger.info("Shutting down...")
+    await log_broadcaster.stop()
+    await outbound_queues.stop()
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
 
 
 # Create FastAPI app
@@ -118,6 +190,30 @@ async def health_check():
     }
 
 
+# Connection pool metrics
+@app.get("/health/db")
+async def db_pool_metrics():
+    """Checked-out connections, overflow and checkout wait times per engine pool"""
+    return pool_stats()
+
+
+metrics_registry = CollectorRegistry()
+metrics_registry.register(PoolCollector())
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Pool gauges and the checkout wait histogram in Prometheus text format"""
+    return Response(generate_latest(metrics_registry), media_type=CONTENT_TYPE_LATEST)
+
+
+# Live log fan-out metrics
+@app.get("/health/live")
+async def live_metrics():
+    """Outbound queue depth and slow-consumer counters for live log subscribers"""
+    return outbound_queues.stats()
+
+
 # Socket.IO events
 @sio.event
 async def connect(sid, environ):
@@ -130,19 +226,79 @@ async def connect(sid, environ):
 async def disconnect(sid):
     """Handle client disconnect"""
     logger.info(f"Client disconnected: {sid}")
+    subscriptions.unsubscribe(sid)
+    outbound_queues.detach(sid)
 
 
 @sio.event
 async def subscribe_logs(sid, data):
-    """Subscribe client to real-time log updates"""
-    logger.info(f"Client {sid} subscribed to logs")
-    await sio.enter_room(sid, 'logs')
+    """
+    Subscribe client to real-time log updates
+    
+    data may carry hospital_id, min_level, event_types and patient_id;
+    subscribing again replaces the previous filters. A reconnecting client
+    passes last_seen_id and/or last_seen_timestamp to get the logs it missed,
+    served from the replay buffer or, if it no longer reaches back that
+    far, from the database. If last_seen_id is no longer stored either, the
+    client gets a logs_skipped message without a count and reloads.
+    """
+    data = data or {}
+    try:
+        log_filter = LogFilter.from_dict(data)
+        last_seen_id = data.get("last_seen_id") or None
+        last_seen_timestamp = _parse_timestamp(data.get("last_seen_timestamp"))
+    except (InvalidSubscriptionError, ValueError, TypeError) as e:
+        await sio.emit('subscription_error', {'detail': str(e)}, room=sid)
+        return
+    
+    missed, skipped, position_lost = [], 0, False
+    if last_seen_id or last_seen_timestamp:
+        missed = replay_buffer.since(last_seen_id, last_seen_timestamp)
+        if missed is None:
+            replayed = await asyncio.to_thread(
+                replay_from_database, log_filter, last_seen_id, last_seen_timestamp, settings.LIVE_REPLAY_LIMIT
+            )
+            missed, skipped = replayed or ([], 0)
+            position_lost = replayed is None
+            # Add anything broadcast while the query ran
+            if missed:
+                newest = datetime.fromisoformat(missed[-1]["timestamp"])
+                missed += replay_buffer.newer_than(newest, {log["id"] for log in missed})
+        missed = [log for log in missed if log_filter.matches(log)]
+    
+    # No awaits from here on, so no broadcast can slip in between the replay and the subscription
+    subscriptions.subscribe(sid, log_filter)
+    outbound_queues.attach(sid)
+    if position_lost:
+        outbound_queues.report_resync(sid)
+    elif skipped:
+        start_date = last_seen_timestamp.isoformat() if last_seen_timestamp else None
+        outbound_queues.report_skipped(sid, skipped, start_date, missed[0]["timestamp"])
+    outbound_queues.enqueue(sid, missed)
+    logger.info(f"Client {sid} subscribed to logs with {log_filter}, replaying {len(missed)} missed logs")
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    """Naive UTC datetime from an ISO 8601 string sent by a client"""
+    if not value:
+        return None
+    timestamp = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+# Broadcast new logs (called by log_broadcaster with each micro-batch)
+async def broadcast_new_logs(logs: list):
+    """Queue the logs in a batch for each subscriber whose filters match"""
+    replay_buffer.extend(logs)
+    for sid, sid_logs in subscriptions.route(logs).items():
+        outbound_queues.enqueue(sid, sid_logs)
 
 
-# Broadcast new log event (called by background generator)
-async def broadcast_new_log(log_data: dict):
-    """Broadcast new log to all connected clients"""
-    await sio.emit('new_log', log_data, room='logs')
+async def send_to_subscriber(sid: str, event: str, data):
+    """Emit to one client and wait for its acknowledgement"""
+    await sio.call(event, data, to=sid, timeout=settings.LIVE_ACK_TIMEOUT)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the audit trail database
+
+Usage:
+    python -m app.manage backfill-rollup [--since 2025-01-01T00:00:00]
+    python -m app.manage migrate-indexes
+    python -m app.manage promote-detail-fields [--batch-size 5000]
+    python -m app.manage partition-logs
+    python -m app.manage maintain-partitions [--ahead 3] [--drop-before 2025-01-01]
+    python -m app.manage apply-retention [--dry-run] [--no-archive] [--batch-size 5000]
+    python -m app.manage archive-cold --days 90 | --before 2025-01-01
+    python -m app.manage rebuild-search-index
+    python -m app.manage rebuild-log-search
+    python -m app.manage seed-logs --rows 10000000 [--days 30] [--workers 8] [--seed 42]
+"""
+
+import argparse
+import os
+from datetime import datetime, timedelta
+
+from .data_seeder import seed_generators, seed_hospitals, seed_users, seed_devices, seed_patients, seed_historical_logs
+from .database import audit_logs_partitioned, engine, init_db, SessionLocal
+from .migrations import add_promoted_detail_columns, backfill_promoted_detail_columns, migrate_audit_log_indexes
+from .services.partition_service import PartitionService
+from .services.retention_service import RetentionService
+from .services.cold_storage import cold_storage
+from .services.search_service import SearchService
+from .services.log_search import LogSearchService
+from .services.rollup_service import RollupService
+from .utils.logging import setup_logging
+
+
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def backfill_rollup(args):
+    """Rebuild audit_hourly_rollup from audit_logs"""
+    since = datetime.fromisoformat(args.since) if args.since else None
+    
+    db = SessionLocal()
+    try:
+        total = RollupService.backfill(db, since=since, batch_size=args.batch_size)
+        print(f"Aggregated {total} audit logs into audit_hourly_rollup")
+    finally:
+        db.close()
+
+
+def migrate_indexes(args):
+    """Switch audit_logs to the composite index set"""
+    migrate_audit_log_indexes(engine)
+    print("audit_logs indexes migrated")
+
+
+def promote_detail_fields(args):
+    """Add and backfill the columns promoted from details, then index them"""
+    add_promoted_detail_columns(engine)
+    total = backfill_promoted_detail_columns(engine, batch_size=args.batch_size)
+    print(f"Backfilled promoted detail columns for {total} audit logs")
+    migrate_audit_log_indexes(engine)
+    print("audit_logs indexes migrated")
+
+
+def partition_logs(args):
+    """Convert an unpartitioned audit_logs table to monthly partitions"""
+    boundary = PartitionService.convert(engine)
+    if boundary is not None:
+        print(f"audit_logs partitioned by month from {boundary:%Y-%m}; older rows stay in audit_logs_legacy")
+
+
+def maintain_partitions(args):
+    """Create upcoming monthly partitions and drop expired ones"""
+    created = PartitionService.ensure_partitions(engine, months_ahead=args.ahead)
+    print(f"Created {len(created)} partitions")
+    
+    if args.drop_before:
+        dropped = PartitionService.drop_partitions_before(engine, datetime.fromisoformat(args.drop_before))
+        print(f"Dropped {len(dropped)} partitions: {', '.join(dropped) or '-'}")
+
+
+def apply_retention(args):
+    """Archive and delete audit logs past their retention window"""
+    db = SessionLocal()
+    try:
+        if args.dry_run:
+            counts = RetentionService.count_expired(db)
+            verb = "Would delete"
+        else:
+            counts = RetentionService.purge_expired(db, batch_size=args.batch_size, archive=not args.no_archive)
+            verb = "Deleted"
+        for rule, count in counts.items():
+            print(f"{verb} {count} logs ({rule})")
+    finally:
+        db.close()
+
+
+def archive_cold(args):
+    """Move old audit logs to the Parquet cold storage tier"""
+    if args.before:
+        cutoff = datetime.fromisoformat(args.before)
+    else:
+        cutoff = datetime.utcnow() - timedelta(days=args.days)
+    
+    db = SessionLocal()
+    try:
+        moved = cold_storage.archive_before(db, cutoff, batch_size=args.batch_size)
+        print(f"Moved {moved} audit logs before {cutoff:%Y-%m-%d} to {cold_storage.root}")
+    finally:
+        db.close()
+
+
+def rebuild_search_index(args):
+    """Reindex users, devices and patients for /api/search"""
+    db = SessionLocal()
+    try:
+        total = SearchService.rebuild(db)
+        print(f"Indexed {total} entities")
+    finally:
+        db.close()
+
+
+def rebuild_log_search(args):
+    """Recreate the SQLite full-text index over audit log messages"""
+    with engine.begin() as connection:
+        LogSearchService.rebuild(connection)
+    print("audit_logs_fts rebuilt" if engine.dialect.name == "sqlite" else "PostgreSQL search indexes are created by migrate-indexes")
+
+
+def seed_logs(args):
+    """Generate a historical audit log dataset of a given size"""
+    if audit_logs_partitioned:
+        PartitionService.ensure_partitions(engine, since=datetime.utcnow() - timedelta(days=args.days))
+    
+    if args.seed is not None:
+        seed_generators(args.seed)
+    
+    db = SessionLocal()
+    try:
+        seed_hospitals(db)
+        seed_users(db)
+        seed_devices(db)
+        seed_patients(db)
+        total = seed_historical_logs(
+            db,
+            days=args.days,
+            target_rows=args.rows,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            seed=args.seed
+        )
+        print(f"Inserted {total} audit logs")
+    finally:
+        db.close()
+
+
+def main():
+    """Parse arguments and run a maintenance command"""
+    parser = argparse.ArgumentParser(prog="python -m app.manage", description="Audit trail maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    rollup_parser = subparsers.add_parser("backfill-rollup", help="rebuild the hourly analytics rollup")
+    rollup_parser.add_argument("--since", help="only rebuild hours from this ISO timestamp on (never before the oldest stored log)")
+    rollup_parser.add_argument("--batch-size", type=int, default=10000, help="rows fetched per round trip")
+    rollup_parser.set_defaults(func=backfill_rollup)
+    
+    index_parser = subparsers.add_parser("migrate-indexes", help="replace legacy audit_logs indexes")
+    index_parser.set_defaults(func=migrate_indexes)
+    
+    promote_parser = subparsers.add_parser("promote-detail-fields", help="backfill columns promoted from details")
+    promote_parser.add_argument("--batch-size", type=int, default=5000, help="rows updated per transaction")
+    promote_parser.set_defaults(func=promote_detail_fields)
+    
+    partition_parser = subparsers.add_parser("partition-logs", help="convert audit_logs to monthly partitions")
+    partition_parser.set_defaults(func=partition_logs)
+    
+    maintain_parser = subparsers.add_parser("maintain-partitions", help="create and drop monthly partitions")
+    maintain_parser.add_argument("--ahead", type=int, help="future months to create partitions for")
+    maintain_parser.add_argument("--drop-before", help="drop partitions entirely before this ISO date")
+    maintain_parser.set_defaults(func=maintain_partitions)
+    
+    retention_parser = subparsers.add_parser("apply-retention", help="archive and delete expired audit logs")
+    retention_parser.add_argument("--dry-run", action="store_true", help="only count expired logs")
+    retention_parser.add_argument("--no-archive", action="store_true", help="delete without writing archive files")
+    retention_parser.add_argument("--batch-size", type=int, help="rows archived and deleted per transaction")
+    retention_parser.set_defaults(func=apply_retention)
+    
+    cold_parser = subparsers.add_parser("archive-cold", help="move old audit logs to Parquet cold storage")
+    cold_group = cold_parser.add_mutually_exclusive_group(required=True)
+    cold_group.add_argument("--days", type=int, help="move logs older than this many days")
+    cold_group.add_argument("--before", help="move logs before this ISO date")
+    cold_parser.add_argument("--batch-size", type=int, help="rows deleted per transaction")
+    cold_parser.set_defaults(func=archive_cold)
+    
+    search_parser = subparsers.add_parser("rebuild-search-index", help="reindex entities for search")
+    search_parser.set_defaults(func=rebuild_search_index)
+    
+    log_search_parser = subparsers.add_parser("rebuild-log-search", help="reindex audit log messages for /api/logs/search")
+    log_search_parser.set_defaults(func=rebuild_log_search)
+    
+    seed_parser = subparsers.add_parser("seed-logs", help="bulk generate historical audit logs")
+    seed_parser.add_argument("--rows", type=positive_int, required=True, help="total number of logs to generate")
+    seed_parser.add_argument("--days", type=positive_int, default=30, help="days of history to spread the logs over")
+    seed_parser.add_argument("--batch-size", type=int, default=5000, help="rows per bulk insert")
+    seed_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="generator processes")
+    seed_parser.add_argument("--seed", type=int, help="base seed for reproducible event content and ids (timestamps follow the run time)")
+    seed_parser.set_defaults(func=seed_logs)
+    
+    args = parser.parse_args()
+    
+    setup_logging()
+    init_db()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
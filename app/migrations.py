@@ -0,0 +1,145 @@
+"""
+Schema migrations for databases created before a model change
+
+create_all() only creates missing tables, so index changes on existing
+tables are applied here.
+"""
+
+from sqlalchemy import and_, func, inspect, select, text, tuple_, update
+from sqlalchemy.engine import Engine
+from .models import AuditLog
+from .models.audit import PROMOTED_DETAIL_PATHS, detail_path_expression
+from .utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Single-column indexes audit_logs used to have, as (name, columns)
+LEGACY_AUDIT_LOG_INDEXES = [
+    ("ix_audit_logs_id", "id"),
+    ("ix_audit_logs_timestamp", "timestamp"),
+    ("ix_audit_logs_level", "level"),
+    ("ix_audit_logs_event_type", "event_type"),
+    ("ix_audit_logs_user_id", "user_id"),
+    ("ix_audit_logs_device_id", "device_id"),
+    ("ix_audit_logs_hospital_id", "hospital_id"),
+    ("ix_audit_logs_source_ip", "source_ip"),
+    ("ix_audit_logs_created_at", "created_at"),
+]
+
+
+# Expression indexes on details, replaced by the promoted detail columns,
+# promoted column indexes no endpoint filters on, and composites replaced
+# by versions ending in id
+SUPERSEDED_AUDIT_LOG_INDEXES = [
+    "ix_audit_logs_hospital_timestamp",
+    "ix_audit_logs_level_timestamp",
+    "ix_audit_logs_event_type_timestamp",
+    "ix_audit_logs_clinic_timestamp",
+    "ix_audit_logs_accession_number_timestamp",
+    "ix_audit_logs_study_instance_uid_timestamp",
+    "ix_audit_logs_hl7_message_id_timestamp",
+    "ix_audit_logs_modality_timestamp",
+    "ix_audit_logs_patient_id",
+    "ix_audit_logs_detail_accession_number",
+    "ix_audit_logs_detail_study_instance_uid",
+    "ix_audit_logs_detail_series_instance_uid",
+    "ix_audit_logs_detail_hl7_message_id",
+    "ix_audit_logs_detail_clinic",
+    "ix_audit_logs_series_instance_uid_timestamp",
+]
+
+
+def create_legacy_audit_log_indexes(engine: Engine):
+    """Recreate the pre-migration index set (used by benchmarks)"""
+    with engine.begin() as connection:
+        for name, column in LEGACY_AUDIT_LOG_INDEXES:
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON audit_logs ({column})"))
+
+
+def _audit_log_index_names(connection) -> set:
+    """Index names on audit_logs, expression indexes included (reflection skips them on SQLite)"""
+    if connection.dialect.name == "sqlite":
+        query = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'audit_logs'"
+    else:
+        query = "SELECT indexname FROM pg_indexes WHERE tablename = 'audit_logs'"
+    return set(connection.execute(text(query)).scalars())
+
+
+def migrate_audit_log_indexes(engine: Engine):
+    """
+    Replace the single-column audit_logs indexes with the composite set
+    
+    Idempotent: legacy and superseded indexes are dropped if present and
+    the indexes declared on AuditLog are created if missing.
+    """
+    with engine.begin() as connection:
+        for name in [name for name, _ in LEGACY_AUDIT_LOG_INDEXES] + SUPERSEDED_AUDIT_LOG_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            logger.info(f"Dropped index {name} (if present)")
+        
+        existing = _audit_log_index_names(connection)
+        for index in AuditLog.__table__.indexes:
+            if index.name not in existing:
+                index.create(connection)
+                logger.info(f"Created index {index.name}")
+
+
+def add_promoted_detail_columns(engine: Engine) -> list:
+    """
+    Add the promoted details columns to an existing audit_logs table
+    
+    Nullable columns without a default are a catalog-only change on both
+    SQLite and PostgreSQL, so this is cheap enough to run at startup.
+    Existing rows stay NULL until backfill_promoted_detail_columns runs.
+    """
+    with engine.begin() as connection:
+        existing = {column["name"] for column in inspect(connection).get_columns("audit_logs")}
+        added = []
+        for name in PROMOTED_DETAIL_PATHS:
+            if name not in existing:
+                column_type = AuditLog.__table__.c[name].type.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE audit_logs ADD COLUMN {name} {column_type}"))
+                added.append(name)
+    if added:
+        logger.info(f"Added audit_logs columns: {', '.join(added)}")
+    return added
+
+
+def backfill_promoted_detail_columns(engine: Engine, batch_size: int = 5000) -> int:
+    """
+    Copy the promoted values out of details for rows inserted before the columns existed
+    
+    Walks audit_logs in (timestamp, id) order and updates one batch per
+    transaction with the database's own JSON functions, so rows are never
+    loaded into Python. Values already set are kept (COALESCE), making the
+    backfill safe to rerun or interrupt.
+    """
+    audit_logs = AuditLog.__table__
+    values = {
+        name: func.coalesce(audit_logs.c[name], detail_path_expression(audit_logs.c.details, path))
+        for name, path in PROMOTED_DETAIL_PATHS.items()
+    }
+    position = (audit_logs.c.timestamp, audit_logs.c.id)
+    
+    total = 0
+    last = None
+    while True:
+        with engine.begin() as connection:
+            query = select(*position).order_by(*position).limit(batch_size)
+            if last is not None:
+                query = query.where(tuple_(*position) > tuple_(*last))
+            batch = connection.execute(query).all()
+            if not batch:
+                break
+            
+            # The timestamp range lets PostgreSQL prune partitions
+            connection.execute(update(audit_logs).where(and_(
+                audit_logs.c.timestamp.between(batch[0].timestamp, batch[-1].timestamp),
+                audit_logs.c.id.in_([row.id for row in batch]),
+                audit_logs.c.details.isnot(None),
+            )).values(values))
+        
+        total += len(batch)
+        last = tuple(batch[-1])
+        logger.info(f"Backfilled promoted detail columns for {total} audit logs...")
+    return total
@@ -7,6 +7,7 @@ from .user import User
 from .device import Device
 from .patient import Patient
 from .audit import AuditLog
+from .rollup import AuditHourlyRollup
+from .search import SearchIndexEntry
 
-__all__ = ["Hospital", "User", "Device", "Patient", "AuditLog"]
-
+__all__ = ["Hospital", "User", "Device", "Patient", "AuditLog", "AuditHourlyRollup", "SearchIndexEntry"]
@@ -2,11 +2,70 @@
 Audit Log model
 """
 
-from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Text, JSON
+from sqlalchemy import Column, DDL, String, DateTime, Enum, ForeignKey, Text, JSON, Index, event, func, literal_column
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
-from ..database import Base
+from ..database import Base, audit_logs_partitioned, is_sqlite
+
+
+# details values copied into their own columns at insert time: column -> JSON path
+PROMOTED_DETAIL_PATHS = {
+    "accession_number": ("accession_number",),
+    "study_instance_uid": ("study_instance_uid",),
+    "series_instance_uid": ("series_instance_uid",),
+    "hl7_message_id": ("hl7_message_id",),
+    "modality": ("modality",),
+    "floor": ("location", "floor"),
+    "clinic": ("location", "clinic"),
+    "unit": ("location", "unit"),
+}
+
+
+def detail_path_expression(details, path):
+    """
+    SQL expression for the text value at a JSON path in details
+    
+    The path is rendered as a literal so the statement can be reused for
+    every batch of a backfill without re-binding it.
+    """
+    if is_sqlite:
+        return func.json_extract(details, literal_column("'$." + ".".join(path) + "'"))
+    return details.op("#>>", return_type=Text)(literal_column("'{" + ",".join(path) + "}'"))
+
+
+def _promoted_detail(name: str):
+    """
+    Column default copying PROMOTED_DETAIL_PATHS[name] out of the row's details
+    
+    Runs per row for ORM flushes and Core executemany inserts alike, so
+    every insert path fills the column without extra code.
+    """
+    path = PROMOTED_DETAIL_PATHS[name]
+    
+    def default(context):
+        value = context.get_current_parameters().get("details")
+        for key in path:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return None if value is None else str(value)
+    
+    return default
+
+
+def _promoted_lookup_index(name: str, column, timestamp, log_id):
+    """Partial (value, timestamp, id) index; most logs have no imaging or HL7 values"""
+    return Index(
+        f"ix_audit_logs_{name}_timestamp_id", column, timestamp, log_id,
+        sqlite_where=column.isnot(None),
+        postgresql_where=column.isnot(None),
+    )
+
+
+def message_tsvector(message):
+    """to_tsvector expression the PostgreSQL message full-text index is built on"""
+    return func.to_tsvector(literal_column("'simple'"), message)
 
 
 class LogLevel(str, enum.Enum):
@@ -72,43 +131,118 @@ class EventType(str, enum.Enum):
 
 
 class AuditLog(Base):
-    """Audit log model"""
+    """
+    Audit log model
+    
+    Indexes follow the query shapes: filters on hospital, level or event type
+    combined with a timestamp range or ordering, and (timestamp, id) keyset
+    pagination. Columns that are only ever displayed are not indexed.
+    
+    message is full-text indexed (GIN over to_tsvector on PostgreSQL, the
+    audit_logs_fts FTS5 table on SQLite) for LogSearchService. The hot
+    details values (PROMOTED_DETAIL_PATHS) are copied into typed columns at
+    insert time so lookups and per-clinic or per-modality analytics never
+    parse JSON; only the columns /api/logs/search filters on are indexed.
+    
+    With AUDIT_LOG_PARTITIONING on PostgreSQL the table is range partitioned
+    by month on timestamp (see PartitionService). PostgreSQL requires the
+    partition key in the primary key, so timestamp joins id there.
+    """
     __tablename__ = "audit_logs"
     
-    id = Column(String(50), primary_key=True, index=True)
-    timestamp = Column(DateTime, nullable=False, index=True, default=datetime.utcnow)
-    level = Column(Enum(LogLevel), nullable=False, index=True)
-    event_type = Column(Enum(EventType), nullable=False, index=True)
+    id = Column(String(50), primary_key=True)
+    timestamp = Column(DateTime, primary_key=audit_logs_partitioned, nullable=False, default=datetime.utcnow)
+    level = Column(Enum(LogLevel), nullable=False)
+    event_type = Column(Enum(EventType), nullable=False)
     message = Column(Text, nullable=False)
     
     # Relationships
-    user_id = Column(String(50), ForeignKey("users.id"), index=True)
+    user_id = Column(String(50), ForeignKey("users.id"))
     user = relationship("User", back_populates="audit_logs")
     
-    device_id = Column(String(50), ForeignKey("devices.id"), index=True)
+    device_id = Column(String(50), ForeignKey("devices.id"))
     device = relationship("Device", back_populates="audit_logs")
     
-    patient_id = Column(String(50), ForeignKey("patients.id"), index=True)
+    patient_id = Column(String(50), ForeignKey("patients.id"))
     patient = relationship("Patient", back_populates="audit_logs")
     
-    hospital_id = Column(String(50), ForeignKey("hospitals.id"), nullable=False, index=True)
+    hospital_id = Column(String(50), ForeignKey("hospitals.id"), nullable=False)
     hospital = relationship("Hospital", back_populates="audit_logs")
     
     # Network info
-    source_ip = Column(String(50), index=True)
+    source_ip = Column(String(50))
     user_agent = Column(String(500))
     
     # Additional details (JSON)
     details = Column(JSON)
     
+    # Promoted from details (see PROMOTED_DETAIL_PATHS)
+    accession_number = Column(String(64), default=_promoted_detail("accession_number"))
+    study_instance_uid = Column(String(64), default=_promoted_detail("study_instance_uid"))
+    series_instance_uid = Column(String(64), default=_promoted_detail("series_instance_uid"))
+    hl7_message_id = Column(String(64), default=_promoted_detail("hl7_message_id"))
+    modality = Column(String(16), default=_promoted_detail("modality"))
+    floor = Column(String(50), default=_promoted_detail("floor"))
+    clinic = Column(String(100), default=_promoted_detail("clinic"))
+    unit = Column(String(100), default=_promoted_detail("unit"))
+    
     # Media references
     hl7_message_path = Column(String(500))
     dicom_path = Column(String(500))
     pdf_path = Column(String(500))
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Keyset pagination, export, replay and plain time ranges
+        Index("ix_audit_logs_timestamp_id", timestamp, id),
+        # Filtered lists and pages: equality filter, then (timestamp, id) so
+        # the index gives the ORDER BY and seeks on the keyset cursor
+        Index("ix_audit_logs_hospital_timestamp_id", hospital_id, timestamp, id),
+        Index("ix_audit_logs_level_timestamp_id", level, timestamp, id),
+        Index("ix_audit_logs_event_type_timestamp_id", event_type, timestamp, id),
+        # Replay for a patient subscription
+        Index("ix_audit_logs_patient_timestamp_id", patient_id, timestamp, id),
+        # /api/logs/search
+        Index("ix_audit_logs_message_fts", message_tsvector(message), postgresql_using="gin").ddl_if(dialect="postgresql"),
+        _promoted_lookup_index("accession_number", accession_number, timestamp, id),
+        _promoted_lookup_index("study_instance_uid", study_instance_uid, timestamp, id),
+        _promoted_lookup_index("hl7_message_id", hl7_message_id, timestamp, id),
+        # Per-clinic and per-modality analytics over a time window
+        Index("ix_audit_logs_clinic_timestamp_id", clinic, timestamp, id),
+        _promoted_lookup_index("modality", modality, timestamp, id),
+        {"postgresql_partition_by": 'RANGE ("timestamp")'} if audit_logs_partitioned else {},
+    )
     
     def __repr__(self):
         return f"<AuditLog(id={self.id}, event_type={self.event_type}, timestamp={self.timestamp})>"
 
+
+# SQLite full-text index over message. audit_logs has a text primary key,
+# so its implicit rowid can change on VACUUM; the contentless FTS5 table is
+# keyed instead on audit_logs_fts_keys.fts_rowid, an INTEGER PRIMARY KEY
+# (kept by VACUUM) mapped to the log id.
+AUDIT_LOG_FTS_TABLES = ("audit_logs_fts", "audit_logs_fts_keys")
+AUDIT_LOG_FTS_TRIGGERS = ("audit_logs_fts_ai", "audit_logs_fts_ad", "audit_logs_fts_au")
+AUDIT_LOG_FTS_DDL = (
+    "CREATE TABLE IF NOT EXISTS audit_logs_fts_keys ("
+    "fts_rowid INTEGER PRIMARY KEY, log_id VARCHAR(50) NOT NULL UNIQUE)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS audit_logs_fts USING fts5("
+    "message, content='', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_ai AFTER INSERT ON audit_logs BEGIN "
+    "INSERT INTO audit_logs_fts_keys(log_id) VALUES (new.id); "
+    "INSERT INTO audit_logs_fts(rowid, message) VALUES (last_insert_rowid(), new.message); END",
+    "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_ad AFTER DELETE ON audit_logs BEGIN "
+    "INSERT INTO audit_logs_fts(audit_logs_fts, rowid, message) VALUES "
+    "('delete', (SELECT fts_rowid FROM audit_logs_fts_keys WHERE log_id = old.id), old.message); "
+    "DELETE FROM audit_logs_fts_keys WHERE log_id = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS audit_logs_fts_au AFTER UPDATE OF message ON audit_logs BEGIN "
+    "INSERT INTO audit_logs_fts(audit_logs_fts, rowid, message) VALUES "
+    "('delete', (SELECT fts_rowid FROM audit_logs_fts_keys WHERE log_id = old.id), old.message); "
+    "INSERT INTO audit_logs_fts(rowid, message) VALUES "
+    "((SELECT fts_rowid FROM audit_logs_fts_keys WHERE log_id = new.id), new.message); END",
+)
+
+for statement in AUDIT_LOG_FTS_DDL:
+    event.listen(AuditLog.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,24 @@
+"""
+Hourly audit log rollup model
+"""
+
+from sqlalchemy import Column, String, DateTime, Enum, Integer, Index
+from .audit import LogLevel, EventType
+from ..database import Base
+
+
+class AuditHourlyRollup(Base):
+    """Pre-aggregated audit log counts per hospital, hour, level and event type"""
+    __tablename__ = "audit_hourly_rollup"
+    __table_args__ = (
+        Index("ix_audit_hourly_rollup_hour", "hour"),
+    )
+    
+    hospital_id = Column(String(50), primary_key=True)
+    hour = Column(DateTime, primary_key=True)  # Truncated to the hour (UTC)
+    level = Column(Enum(LogLevel), primary_key=True)
+    event_type = Column(Enum(EventType), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<AuditHourlyRollup(hospital_id={self.hospital_id}, hour={self.hour}, event_type={self.event_type}, count={self.count})>"
@@ -0,0 +1,54 @@
+"""
+Search index model
+"""
+
+from sqlalchemy import Column, DDL, Index, Integer, String, Text, UniqueConstraint, event
+from ..database import Base
+
+
+class SearchIndexEntry(Base):
+    """
+    Folded search text for a user, device or patient
+    
+    content is built by fold_search_text, so matching needs no case or
+    accent handling in the database. PostgreSQL serves substring queries
+    from a pg_trgm GIN index; SQLite from the search_index_fts FTS5 table
+    (trigram tokenizer), which triggers keep in step with this table.
+    """
+    __tablename__ = "search_index"
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_id", name="uq_search_index_entity"),
+        Index(
+            "ix_search_index_content_trgm", "content",
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity_type = Column(String(20), nullable=False)  # user | device | patient
+    entity_id = Column(String(50), nullable=False)
+    content = Column(Text, nullable=False)
+    
+    def __repr__(self):
+        return f"<SearchIndexEntry(entity_type={self.entity_type}, entity_id={self.entity_id})>"
+
+
+event.listen(
+    SearchIndexEntry.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+for statement in (
+    "CREATE VIRTUAL TABLE search_index_fts USING fts5("
+    "content, content='search_index', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER search_index_ai AFTER INSERT ON search_index BEGIN "
+    "INSERT INTO search_index_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER search_index_ad AFTER DELETE ON search_index BEGIN "
+    "INSERT INTO search_index_fts(search_index_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER search_index_au AFTER UPDATE ON search_index BEGIN "
+    "INSERT INTO search_index_fts(search_index_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO search_index_fts(rowid, content) VALUES (new.id, new.content); END",
+):
+    event.listen(SearchIndexEntry.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
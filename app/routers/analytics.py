@@ -3,12 +3,19 @@ Analytics routes for dashboard charts and statistics
 """
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, select
 from typing import Optional, List, Dict
 from datetime import datetime, timedelta
-from ..database import get_db
-from ..models import AuditLog
+import asyncio
+import math
+from ..database import get_async_db
+from ..models import AuditLog, AuditHourlyRollup
+from ..services.cold_storage import cold_storage
+from ..services.rollup_service import RollupService
+from ..utils.time_buckets import (
+    BUCKET_SIZES, bucket_expression, epoch_bucket_expression, fill_buckets, floor_datetime, to_datetime
+)
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
@@ -17,36 +24,70 @@ router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 async def get_activity_analytics(
     hospital_id: Optional[str] = Query(None),
     hours: int = Query(24, ge=1, le=168),  # 1 hour to 1 week
-    db: Session = Depends(get_db)
+    bucket: str = Query("1h", pattern="^(1m|5m|1h|1d)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get activity analytics by hour
-    Returns event counts for each hour in the specified time range
+    Get activity analytics by time bucket
+    Returns event counts for each bucket in the specified time range,
+    including empty buckets with a count of zero
+    
+    1h and 1d buckets are served from audit_hourly_rollup; 1m and 5m
+    buckets are grouped from audit_logs, plus the cold storage tier when the
+    window reaches into archived days. The window starts at the top of the
+    first bucket.
     """
+    seconds = BUCKET_SIZES[bucket]
+    dialect_name = db.get_bind().dialect.name
+    
     # Calculate time range
-    start_time = datetime.utcnow() - timedelta(hours=hours)
+    now = datetime.utcnow()
+    start_time = floor_datetime(now - timedelta(hours=hours), seconds)
     
-    # Base query
-    query = db.query(
-        func.strftime('%Y-%m-%d %H:00:00', AuditLog.timestamp).label('hour'),
-        func.count(AuditLog.id).label('count')
-    ).filter(
-        AuditLog.timestamp >= start_time
-    )
+    if seconds >= BUCKET_SIZES["1h"]:
+        # Hour rows are already bucketed; only coarser buckets need an expression
+        if bucket == "1h":
+            bucket_column = AuditHourlyRollup.hour
+        else:
+            bucket_column = bucket_expression(AuditHourlyRollup.hour, bucket, dialect_name)
+        query = select(
+            bucket_column.label('bucket'),
+            func.sum(AuditHourlyRollup.count).label('count')
+        ).where(
+            AuditHourlyRollup.hour >= start_time
+        )
+        hospital_column = AuditHourlyRollup.hospital_id
+    else:
+        bucket_column = bucket_expression(AuditLog.timestamp, bucket, dialect_name)
+        query = select(
+            bucket_column.label('bucket'),
+            func.count(AuditLog.id).label('count')
+        ).where(
+            AuditLog.timestamp >= start_time
+        )
+        hospital_column = AuditLog.hospital_id
     
     if hospital_id and hospital_id != "all":
-        query = query.filter(AuditLog.hospital_id == hospital_id)
+        query = query.where(hospital_column == hospital_id)
     
-    # Group by hour
-    results = query.group_by('hour').order_by('hour').all()
+    results = (await db.execute(query.group_by(bucket_column))).all()
+    counts = {to_datetime(result.bucket): result.count for result in results}
+    
+    if seconds < BUCKET_SIZES["1h"] and cold_storage.enabled and start_time < cold_storage.boundary():
+        archived = await asyncio.to_thread(
+            cold_storage.bucket_counts, start_time, now, seconds,
+            hospital_id if hospital_id != "all" else None
+        )
+        for bucket_start, count in archived.items():
+            counts[bucket_start] = counts.get(bucket_start, 0) + count
     
     # Format response
     activity_data = [
         {
-            "hour": result.hour,
-            "count": result.count
+            "hour": bucket_start.strftime('%Y-%m-%d %H:%M:00'),
+            "count": count
         }
-        for result in results
+        for bucket_start, count in fill_buckets(counts, start_time, now, seconds)
     ]
     
     return activity_data
@@ -55,20 +96,22 @@ async def get_activity_analytics(
 @router.get("/event-distribution")
 async def get_event_distribution(
     hospital_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get distribution of event types
     """
-    query = db.query(
-        AuditLog.event_type,
-        func.count(AuditLog.id).label('count')
+    query = select(
+        AuditHourlyRollup.event_type,
+        func.sum(AuditHourlyRollup.count).label('count')
     )
     
     if hospital_id and hospital_id != "all":
-        query = query.filter(AuditLog.hospital_id == hospital_id)
+        query = query.where(AuditHourlyRollup.hospital_id == hospital_id)
     
-    results = query.group_by(AuditLog.event_type).order_by(desc('count')).limit(20).all()
+    results = (await db.execute(
+        query.group_by(AuditHourlyRollup.event_type).order_by(desc('count')).limit(20)
+    )).all()
     
     distribution = [
         {
@@ -81,43 +124,97 @@ async def get_event_distribution(
     return distribution
 
 
+async def _count_by(db: AsyncSession, column, hospital_id: Optional[str], hours: int) -> List[Dict]:
+    """Log counts per value of a promoted details column over the last `hours`"""
+    query = select(
+        column.label('value'),
+        func.count().label('count')
+    ).where(
+        AuditLog.timestamp >= datetime.utcnow() - timedelta(hours=hours),
+        column.isnot(None)
+    )
+    
+    if hospital_id and hospital_id != "all":
+        query = query.where(AuditLog.hospital_id == hospital_id)
+    
+    results = (await db.execute(query.group_by(column).order_by(desc('count')))).all()
+    return [{column.key: result.value, "count": result.count} for result in results]
+
+
+@router.get("/clinics")
+async def get_clinic_distribution(
+    hospital_id: Optional[str] = Query(None),
+    hours: int = Query(24, ge=1, le=720),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get event counts per clinic
+    
+    Grouped on the indexed clinic column rather than details JSON.
+    """
+    return await _count_by(db, AuditLog.clinic, hospital_id, hours)
+
+
+@router.get("/modalities")
+async def get_modality_distribution(
+    hospital_id: Optional[str] = Query(None),
+    hours: int = Query(24, ge=1, le=720),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get imaging event counts per modality
+    
+    Grouped on the indexed modality column rather than details JSON.
+    """
+    return await _count_by(db, AuditLog.modality, hospital_id, hours)
+
+
 @router.get("/security")
 async def get_security_analytics(
     hospital_id: Optional[str] = Query(None),
     days: int = Query(7, ge=1, le=30),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get security-related analytics
+    
+    Served from audit_hourly_rollup; the window starts at the top of the
+    first hour.
     """
-    start_time = datetime.utcnow() - timedelta(days=days)
+    start_hour = RollupService.hour_bucket(datetime.utcnow() - timedelta(days=days))
+    
+    security_condition = (
+        (AuditHourlyRollup.level.in_(["ERROR", "CRITICAL"])) |
+        (AuditHourlyRollup.event_type.like("%SECURITY%")) |
+        (AuditHourlyRollup.event_type.like("%ACCESS_DENIED%"))
+    )
     
-    query = db.query(AuditLog).filter(
-        AuditLog.timestamp >= start_time,
-        (AuditLog.level.in_(["ERROR", "CRITICAL"])) |
-        (AuditLog.event_type.like("%SECURITY%")) |
-        (AuditLog.event_type.like("%ACCESS_DENIED%"))
+    query = select(
+        func.sum(AuditHourlyRollup.count).filter(security_condition)
+    ).where(
+        AuditHourlyRollup.hour >= start_hour
     )
     
     if hospital_id and hospital_id != "all":
-        query = query.filter(AuditLog.hospital_id == hospital_id)
+        query = query.where(AuditHourlyRollup.hospital_id == hospital_id)
     
     # Count by severity
-    severity_counts = db.query(
-        AuditLog.level,
-        func.count(AuditLog.id).label('count')
-    ).filter(
-        AuditLog.timestamp >= start_time,
-        AuditLog.level.in_(["ERROR", "CRITICAL", "WARNING"])
+    severity_counts = select(
+        AuditHourlyRollup.level,
+        func.sum(AuditHourlyRollup.count).label('count')
+    ).where(
+        AuditHourlyRollup.hour >= start_hour,
+        AuditHourlyRollup.level.in_(["ERROR", "CRITICAL", "WARNING"])
     )
     
     if hospital_id and hospital_id != "all":
-        severity_counts = severity_counts.filter(AuditLog.hospital_id == hospital_id)
+        severity_counts = severity_counts.where(AuditHourlyRollup.hospital_id == hospital_id)
     
-    severity_results = severity_counts.group_by(AuditLog.level).all()
+    severity_results = (await db.execute(severity_counts.group_by(AuditHourlyRollup.level))).all()
+    total_security_events = (await db.execute(query)).scalar()
     
     return {
-        "total_security_events": query.count(),
+        "total_security_events": total_security_events or 0,
         "severity_breakdown": [
             {"level": result.level, "count": result.count}
             for result in severity_results
@@ -129,32 +226,36 @@ async def get_security_analytics(
 @router.get("/performance")
 async def get_performance_metrics(
     hospital_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get system performance metrics
     """
-    # Events per hour (last 24 hours)
+    # Events in the last hour (bounded range scan on the raw table)
     one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-    events_last_hour = db.query(AuditLog).filter(
-        AuditLog.timestamp >= one_hour_ago
-    ).count()
+    events_last_hour = (await db.execute(
+        select(func.count(AuditLog.id)).where(AuditLog.timestamp >= one_hour_ago)
+    )).scalar()
     
-    # Total events
-    total_events = db.query(AuditLog).count()
+    # Totals from the rollup in a single pass
+    totals = (await db.execute(select(
+        func.sum(AuditHourlyRollup.count).label('total_events'),
+        func.sum(AuditHourlyRollup.count).filter(
+            AuditHourlyRollup.level.in_(["ERROR", "CRITICAL"])
+        ).label('total_errors'),
+        func.sum(AuditHourlyRollup.count).filter(
+            AuditHourlyRollup.level == "INFO"
+        ).label('success_events'),
+    ))).one()
     
-    # Error rate
-    total_errors = db.query(AuditLog).filter(
-        AuditLog.level.in_(["ERROR", "CRITICAL"])
-    ).count()
+    total_events = totals.total_events or 0
+    total_errors = totals.total_errors or 0
+    success_events = totals.success_events or 0
     
+    # Error rate
     error_rate = (total_errors / total_events * 100) if total_events > 0 else 0
     
     # Success rate (INFO events)
-    success_events = db.query(AuditLog).filter(
-        AuditLog.level == "INFO"
-    ).count()
-    
     success_rate = (success_events / total_events * 100) if total_events > 0 else 0
     
     return {
@@ -166,38 +267,101 @@ async def get_performance_metrics(
     }
 
 
+TIMELINE_COLUMNS = (
+    AuditLog.id,
+    AuditLog.timestamp,
+    AuditLog.event_type,
+    AuditLog.level,
+    AuditLog.message,
+    AuditLog.user_id,
+    AuditLog.patient_id,
+)
+
+TIMELINE_KEEP_LEVELS = ["ERROR", "CRITICAL"]
+
+
+def _timeline_point(row, count: int = 1) -> Dict:
+    """Timeline point for an event row standing for `count` events"""
+    return {
+        "id": row.id,
+        "timestamp": row.timestamp.isoformat(),
+        "event_type": row.event_type,
+        "level": row.level,
+        "message": row.message,
+        "user_id": row.user_id,
+        "patient_id": row.patient_id,
+        "count": count,
+    }
+
+
 @router.get("/timeline")
 async def get_timeline_data(
     hospital_id: Optional[str] = Query(None),
     hours: int = Query(24, ge=1, le=168),
-    db: Session = Depends(get_db)
+    max_points: int = Query(1000, ge=10, le=5000),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get timeline visualization data
-    """
-    start_time = datetime.utcnow() - timedelta(hours=hours)
     
-    query = db.query(AuditLog).filter(
-        AuditLog.timestamp >= start_time
-    )
+    Returns at most max_points events. Larger windows are downsampled:
+    every ERROR/CRITICAL event is kept (unless they alone exceed the cap),
+    the rest are grouped into equal-width time buckets represented by their
+    earliest event. "count" is the number of events a point stands for.
+    """
+    now = datetime.utcnow()
+    start_time = now - timedelta(hours=hours)
     
+    conditions = [AuditLog.timestamp >= start_time, AuditLog.timestamp <= now]
     if hospital_id and hospital_id != "all":
-        query = query.filter(AuditLog.hospital_id == hospital_id)
+        conditions.append(AuditLog.hospital_id == hospital_id)
     
-    events = query.order_by(AuditLog.timestamp).all()
+    is_kept = AuditLog.level.in_(TIMELINE_KEEP_LEVELS)
+    totals = (await db.execute(select(
+        func.count(AuditLog.id).label('total'),
+        func.count(AuditLog.id).filter(is_kept).label('kept'),
+    ).where(*conditions))).one()
     
-    timeline = [
-        {
-            "id": event.id,
-            "timestamp": event.timestamp.isoformat(),
-            "event_type": event.event_type,
-            "level": event.level,
-            "message": event.message,
-            "user_id": event.user_id,
-            "patient_id": event.patient_id,
-        }
-        for event in events
-    ]
+    if totals.total <= max_points:
+        rows = (await db.execute(
+            select(*TIMELINE_COLUMNS).where(*conditions).order_by(AuditLog.timestamp)
+        )).all()
+        return [_timeline_point(row) for row in rows]
     
-    return timeline
-
+    points = []
+    if totals.kept < max_points:
+        kept_rows = (await db.execute(select(*TIMELINE_COLUMNS).where(*conditions, is_kept))).all()
+        points.extend(_timeline_point(row) for row in kept_rows)
+        conditions.append(~is_kept)
+    
+    # Bucket the remaining events so that at most the leftover budget is used.
+    # Buckets start at the window's first whole second; every event is
+    # within window_seconds of it, and window_seconds // seconds < budget.
+    budget = max_points - len(points)
+    origin = start_time.replace(microsecond=0)
+    window_seconds = math.ceil((now - origin).total_seconds())
+    seconds = window_seconds // budget + 1
+    bucket_column = epoch_bucket_expression(AuditLog.timestamp, seconds, db.get_bind().dialect.name, origin)
+    
+    buckets = select(
+        bucket_column.label('bucket'),
+        func.min(AuditLog.timestamp).label('first_timestamp'),
+        func.count(AuditLog.id).label('count')
+    ).where(*conditions).group_by(bucket_column).subquery()
+    
+    # Representative event per bucket: the earliest one
+    rows = (await db.execute(
+        select(*TIMELINE_COLUMNS, buckets.c.bucket, buckets.c.count).join(
+            buckets, AuditLog.timestamp == buckets.c.first_timestamp
+        ).where(*conditions)
+    )).all()
+    
+    seen = set()
+    for row in rows:
+        if row.bucket in seen:
+            continue
+        seen.add(row.bucket)
+        points.append(_timeline_point(row, row.count))
+    
+    points.sort(key=lambda point: point["timestamp"])
+    return points
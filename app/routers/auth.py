@@ -3,8 +3,9 @@ Authentication routes
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
 from ..schemas import TokenResponse, LoginRequest
 from ..services.auth_service import AuthService
 from ..models import User
@@ -13,7 +14,7 @@ router = APIRouter(prefix="/api/auth", tags=["authentication"])
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Login endpoint - returns JWT token
     
@@ -32,7 +33,7 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
         return TokenResponse(access_token=token)
     
     # Try to find user in database
-    user = db.query(User).filter(User.email == request.username).first()
+    user = (await db.execute(select(User).where(User.email == request.username))).scalars().first()
     
     if not user:
         # For demo: create a token anyway
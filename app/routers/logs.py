@@ -2,34 +2,55 @@
 Audit logs routes
 """
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import Optional, List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, or_, func, select, tuple_
+from typing import Optional, List, Iterator
 from datetime import datetime, timedelta
-from ..database import get_db
-from ..schemas import AuditLogResponse, DashboardStats, HospitalResponse, UserResponse, DeviceResponse, PatientResponse
+import asyncio
+import csv
+import io
+import itertools
+import json
+from ..database import get_async_db, ReadSessionLocal
+from ..schemas import AuditLogResponse, AuditLogPage, DashboardStats, HospitalResponse, UserResponse, DeviceResponse, PatientResponse
 from ..models import AuditLog, Hospital, User, Device, Patient
+from ..services.cold_storage import cold_storage
+from ..services.log_search import LogSearchService
+from ..utils.pagination import encode_cursor, decode_cursor, InvalidCursorError
 
 router = APIRouter(prefix="/api", tags=["logs"])
 
 
-@router.get("/logs", response_model=List[AuditLogResponse])
-async def get_logs(
-    hospital_id: Optional[str] = Query(None),
-    level: Optional[str] = Query(None),
-    event_type: Optional[str] = Query(None),
-    start_date: Optional[str] = Query(None),
-    end_date: Optional[str] = Query(None),
-    limit: int = Query(1000, le=5000),
-    db: Session = Depends(get_db)
+# Columns written by /logs/export, in output order
+EXPORT_COLUMNS = [
+    AuditLog.id,
+    AuditLog.timestamp,
+    AuditLog.level,
+    AuditLog.event_type,
+    AuditLog.message,
+    AuditLog.user_id,
+    AuditLog.device_id,
+    AuditLog.patient_id,
+    AuditLog.hospital_id,
+    AuditLog.source_ip,
+    AuditLog.details,
+]
+
+# Rows fetched per round trip while streaming an export
+EXPORT_BATCH_SIZE = 1000
+
+
+def apply_log_filters(
+    query,
+    hospital_id: Optional[str] = None,
+    level: Optional[str] = None,
+    event_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
 ):
-    """
-    Get audit logs with filters
-    """
-    query = db.query(AuditLog)
-    
-    # Apply filters
+    """Apply the common /api/logs filters to a query"""
     if hospital_id and hospital_id != "all":
         query = query.filter(AuditLog.hospital_id == hospital_id)
     
@@ -45,112 +66,374 @@ async def get_logs(
     if end_date:
         query = query.filter(AuditLog.timestamp <= datetime.fromisoformat(end_date))
     
+    return query
+
+
+def cold_log_filters(
+    hospital_id: Optional[str] = None,
+    level: Optional[str] = None,
+    event_type: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> dict:
+    """The /api/logs filters in the form ColdStorage expects"""
+    return {
+        "hospital_id": hospital_id,
+        "level": level,
+        "event_type": event_type,
+        "start": datetime.fromisoformat(start_date) if start_date else None,
+        "end": datetime.fromisoformat(end_date) if end_date else None,
+    }
+
+
+def _position(log) -> tuple:
+    """(timestamp, id) of an AuditLog row or archived log dict"""
+    if isinstance(log, dict):
+        return log["timestamp"], log["id"]
+    return log.timestamp, log.id
+
+
+def _after_cursor(query, cursor: Optional[str]):
+    """Restrict a newest-first query to rows after a page cursor; returns (query, position)"""
+    if not cursor:
+        return query, None
+    
+    try:
+        cursor_timestamp, cursor_id = decode_cursor(cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Row-value comparison: one range seek on the (timestamp, id) index
+    query = query.filter(tuple_(AuditLog.timestamp, AuditLog.id) < tuple_(cursor_timestamp, cursor_id))
+    return query, (cursor_timestamp, cursor_id)
+
+
+@router.get("/logs", response_model=List[AuditLogResponse])
+async def get_logs(
+    hospital_id: Optional[str] = Query(None),
+    level: Optional[str] = Query(None),
+    event_type: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    limit: int = Query(1000, le=5000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get audit logs with filters
+    
+    Archived logs are older than anything in audit_logs, so the cold
+    storage tier is only read when the hot rows do not fill the limit.
+    """
+    query = apply_log_filters(
+        select(AuditLog), hospital_id, level, event_type, start_date, end_date
+    )
+    
     # Order by timestamp desc and limit
-    logs = query.order_by(desc(AuditLog.timestamp)).limit(limit).all()
+    logs = list((await db.execute(
+        query.order_by(desc(AuditLog.timestamp), desc(AuditLog.id)).limit(limit)
+    )).scalars().all())
+    
+    if len(logs) < limit and cold_storage.enabled:
+        logs += await asyncio.to_thread(
+            cold_storage.query_logs,
+            limit - len(logs),
+            before=_position(logs[-1]) if logs else None,
+            **cold_log_filters(hospital_id, level, event_type, start_date, end_date)
+        )
     
     return logs
 
 
-@router.get("/stats/dashboard", response_model=DashboardStats)
-async def get_dashboard_stats(
+def _export_value(value):
+    """Convert a column value to a JSON/CSV friendly scalar"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # Enum columns come back as str-based enum members
+    return getattr(value, "value", value)
+
+
+def _stream_export(export_format: str, filters: dict) -> Iterator[str]:
+    """
+    Yield an export chunk by chunk
+    
+    The generator owns its session so it stays open for the lifetime of the
+    response, and yield_per keeps only one batch of rows in memory (a
+    server-side cursor on PostgreSQL).
+    """
+    field_names = [column.key for column in EXPORT_COLUMNS]
+    
+    db = ReadSessionLocal()
+    try:
+        query = apply_log_filters(db.query(*EXPORT_COLUMNS), **filters)
+        rows = query.order_by(AuditLog.timestamp, AuditLog.id).yield_per(EXPORT_BATCH_SIZE)
+        
+        # Archived logs are all older, so they come first in timestamp order
+        if cold_storage.enabled:
+            archived = cold_storage.iter_logs(EXPORT_BATCH_SIZE, **cold_log_filters(**filters))
+            rows = itertools.chain(([log[name] for name in field_names] for log in archived), rows)
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        
+        if export_format == "csv":
+            writer.writerow(field_names)
+        
+        for index, row in enumerate(rows, start=1):
+            values = [_export_value(value) for value in row]
+            
+            if export_format == "csv":
+                values[-1] = json.dumps(values[-1], ensure_ascii=False) if values[-1] is not None else ""
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(field_names, values)), ensure_ascii=False))
+                buffer.write("\n")
+            
+            if index % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+@router.get("/logs/export")
+async def export_logs(
     hospital_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    level: Optional[str] = Query(None),
+    event_type: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
 ):
     """
-    Get comprehensive dashboard statistics
+    Stream audit logs as NDJSON or CSV
+    
+    Accepts the same filters as /logs without a row limit. Rows are streamed
+    in batches, so memory use does not grow with the size of the export.
     """
-    # Base query
-    query = db.query(AuditLog)
+    for value in (start_date, end_date):
+        if value:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
     
-    if hospital_id and hospital_id != "all":
-        query = query.filter(AuditLog.hospital_id == hospital_id)
+    filters = {
+        "hospital_id": hospital_id,
+        "level": level,
+        "event_type": event_type,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"audit_logs_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{format}"
+    
+    return StreamingResponse(
+        _stream_export(format, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/logs/page", response_model=AuditLogPage)
+async def get_logs_page(
+    hospital_id: Optional[str] = Query(None),
+    level: Optional[str] = Query(None),
+    event_type: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get audit logs using keyset pagination
+    
+    Pages are ordered by (timestamp, id) descending. The cursor marks the last
+    row of the previous page, so every page is an index range scan starting
+    at that position instead of an OFFSET over all preceding rows. Pages
+    continue into the cold storage tier once audit_logs runs out.
+    """
+    query, position = _after_cursor(apply_log_filters(
+        select(AuditLog), hospital_id, level, event_type, start_date, end_date
+    ), cursor)
+    
+    # Fetch one extra row to know whether another page exists
+    logs = list((await db.execute(
+        query.order_by(desc(AuditLog.timestamp), desc(AuditLog.id)).limit(limit + 1)
+    )).scalars().all())
+    
+    if len(logs) <= limit and cold_storage.enabled:
+        logs += await asyncio.to_thread(
+            cold_storage.query_logs,
+            limit + 1 - len(logs),
+            before=_position(logs[-1]) if logs else position,
+            **cold_log_filters(hospital_id, level, event_type, start_date, end_date)
+        )
+    
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = encode_cursor(*_position(logs[-1]))
+    
+    return AuditLogPage(items=logs, next_cursor=next_cursor)
+
+
+@router.get("/logs/search", response_model=AuditLogPage)
+async def search_logs(
+    q: Optional[str] = Query(None, description="Words that must all appear in the message"),
+    accession_number: Optional[str] = Query(None),
+    study_instance_uid: Optional[str] = Query(None),
+    hl7_message_id: Optional[str] = Query(None),
+    modality: Optional[str] = Query(None),
+    clinic: Optional[str] = Query(None, description="details.location.clinic"),
+    hospital_id: Optional[str] = Query(None),
+    level: Optional[str] = Query(None),
+    event_type: Optional[str] = Query(None),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Search audit logs by message text and details values
     
-    # Total events
-    total_events = query.count()
+    Served from the message full-text index and the indexed columns
+    promoted from details; all given criteria must match. Pages work like
+    /logs/page, but only audit_logs is searched, not the cold storage tier.
+    """
+    details = {
+        "accession_number": accession_number,
+        "study_instance_uid": study_instance_uid,
+        "hl7_message_id": hl7_message_id,
+        "modality": modality,
+        "clinic": clinic,
+    }
+    if not (q and q.strip()) and not any(details.values()):
+        raise HTTPException(status_code=400, detail="Provide q or at least one details value to search for")
     
-    # Active users (distinct)
-    active_users = db.query(User).filter(User.status == "active").count()
+    query = LogSearchService.apply(select(AuditLog), db.get_bind().dialect.name, q, details)
+    query, _ = _after_cursor(apply_log_filters(query, hospital_id, level, event_type, start_date, end_date), cursor)
     
-    # Active devices
-    active_devices = db.query(Device).filter(Device.status == "active").count()
+    logs = list((await db.execute(
+        query.order_by(desc(AuditLog.timestamp), desc(AuditLog.id)).limit(limit + 1)
+    )).scalars().all())
     
-    # Patients
-    patient_count = db.query(Patient).filter(Patient.status == "active").count()
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = encode_cursor(*_position(logs[-1]))
     
-    # Security events
-    security_events = query.filter(
-        (AuditLog.level.in_(["ERROR", "CRITICAL"])) |
-        (AuditLog.event_type.like("%SECURITY%"))
-    ).count()
+    return AuditLogPage(items=logs, next_cursor=next_cursor)
+
+
+@router.get("/stats/dashboard", response_model=DashboardStats)
+async def get_dashboard_stats(
+    hospital_id: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get comprehensive dashboard statistics
     
-    # Events in last hour
+    All counters come from a single statement: the audit_logs counts are
+    computed with filtered aggregates (COUNT ... FILTER) in one pass over the
+    table and the entity counts are attached as scalar subqueries.
+    """
     one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-    events_last_hour = query.filter(AuditLog.timestamp >= one_hour_ago).count()
+    
+    security_condition = or_(
+        AuditLog.level.in_(["ERROR", "CRITICAL"]),
+        AuditLog.event_type.like("%SECURITY%")
+    )
+    
+    active_users = select(func.count(User.id)).where(User.status == "active").scalar_subquery()
+    active_devices = select(func.count(Device.id)).where(Device.status == "active").scalar_subquery()
+    patient_count = select(func.count(Patient.id)).where(Patient.status == "active").scalar_subquery()
+    
+    query = select(
+        func.count(AuditLog.id).label("total_events"),
+        func.count(AuditLog.id).filter(security_condition).label("security_events"),
+        func.count(AuditLog.id).filter(AuditLog.timestamp >= one_hour_ago).label("events_last_hour"),
+        func.count(AuditLog.id).filter(AuditLog.level == "INFO").label("info_events"),
+        active_users.label("active_users"),
+        active_devices.label("active_devices"),
+        patient_count.label("patient_count"),
+    )
+    
+    if hospital_id and hospital_id != "all":
+        query = query.filter(AuditLog.hospital_id == hospital_id)
+    
+    stats = (await db.execute(query)).one()
+    total_events = stats.total_events
+    info_events = stats.info_events
     
     # System health (percentage of INFO level events)
-    info_events = query.filter(AuditLog.level == "INFO").count()
     system_health = (info_events / total_events * 100) if total_events > 0 else 99.9
     
     return DashboardStats(
         total_events=total_events,
-        active_users=active_users,
-        active_devices=active_devices,
-        patient_count=patient_count,
-        security_events=security_events,
-        events_per_hour=events_last_hour,
+        active_users=stats.active_users,
+        active_devices=stats.active_devices,
+        patient_count=stats.patient_count,
+        security_events=stats.security_events,
+        events_per_hour=stats.events_last_hour,
         system_health=round(system_health, 1),
         timestamp=datetime.utcnow()
     )
 
 
 @router.get("/hospitals", response_model=List[HospitalResponse])
-async def get_hospitals(db: Session = Depends(get_db)):
+async def get_hospitals(db: AsyncSession = Depends(get_async_db)):
     """Get all hospitals"""
-    hospitals = db.query(Hospital).filter(Hospital.status == "active").all()
+    hospitals = (await db.execute(select(Hospital).where(Hospital.status == "active"))).scalars().all()
     return hospitals
 
 
 @router.get("/users", response_model=List[UserResponse])
 async def get_users(
     hospital_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all users"""
-    query = db.query(User).filter(User.status == "active")
+    query = select(User).where(User.status == "active")
     
     if hospital_id and hospital_id != "all":
-        query = query.filter(User.hospital_id == hospital_id)
+        query = query.where(User.hospital_id == hospital_id)
     
-    users = query.all()
+    users = (await db.execute(query)).scalars().all()
     return users
 
 
 @router.get("/devices", response_model=List[DeviceResponse])
 async def get_devices(
     hospital_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all devices"""
-    query = db.query(Device).filter(Device.status == "active")
+    query = select(Device).where(Device.status == "active")
     
     if hospital_id and hospital_id != "all":
-        query = query.filter(Device.hospital_id == hospital_id)
+        query = query.where(Device.hospital_id == hospital_id)
     
-    devices = query.all()
+    devices = (await db.execute(query)).scalars().all()
     return devices
 
 
 @router.get("/patients", response_model=List[PatientResponse])
 async def get_patients(
     hospital_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all patients"""
-    query = db.query(Patient).filter(Patient.status == "active")
+    query = select(Patient).where(Patient.status == "active")
     
     if hospital_id and hospital_id != "all":
-        query = query.filter(Patient.hospital_id == hospital_id)
+        query = query.where(Patient.hospital_id == hospital_id)
     
-    patients = query.all()
+    patients = (await db.execute(query)).scalars().all()
     return patients
 
@@ -2,66 +2,133 @@
 Search routes for doctors, devices, patients
 """
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..schemas import UserResponse, DeviceResponse, PatientResponse
-from ..models import User, Device, Patient
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ..config import settings
+from ..database import get_async_db, AsyncSessionLocal
+from ..schemas import UserResponse, DeviceResponse, PatientResponse, SearchResponse, SearchResult
+from ..services.search_service import SEARCHABLE, SearchService, match_rank
+from ..services.typeahead import RESPONSE_SCHEMAS, typeahead_index
+from ..utils.text_search import fold_search_text
 
 router = APIRouter(prefix="/api/search", tags=["search"])
 
+async def _search(db: AsyncSession, entity_type: str, q: str):
+    """Serve from the in-memory index when it is enabled and loaded"""
+    if settings.SEARCH_BACKEND == "memory" and typeahead_index.loaded:
+        return typeahead_index.search(entity_type, q)
+    return await SearchService.search(db, entity_type, q)
+
+
+async def _search_ranked(entity_type: str, q: str, limit: int) -> List:
+    """(match_rank, response item) pairs for one entity type"""
+    schema = RESPONSE_SCHEMAS[entity_type]
+    if settings.SEARCH_BACKEND == "memory" and typeahead_index.loaded:
+        return [(rank, schema.model_validate(payload)) for rank, payload in typeahead_index.search_ranked(entity_type, q, limit)]
+    
+    # One session per entity type so the queries can run concurrently
+    folded = fold_search_text(q)
+    async with AsyncSessionLocal() as db:
+        return [
+            (match_rank(SearchService.document(obj)[2], folded), schema.model_validate(obj))
+            for obj in await SearchService.search(db, entity_type, q, limit)
+        ]
+
+
+async def _disconnected(request: Request):
+    """Return once the server reports that the client went away"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def _unless_disconnected(request: Request, awaitable):
+    """
+    Await `awaitable`; cancel it and return None if the client disconnects first
+    
+    The disconnect is awaited as an ASGI message rather than polled, so an
+    idle search costs nothing while it waits.
+    """
+    task = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(_disconnected(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            return task.result()
+        return None
+    finally:
+        task.cancel()
+        watcher.cancel()
+
+
+@router.get("", response_model=SearchResponse)
+async def search_all(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    types: Optional[str] = Query(None, description="Comma-separated entity types: user, device, patient"),
+    limit: int = Query(5, ge=1, le=50, description="Maximum results per entity type")
+):
+    """
+    Search doctors, devices and patients in one request
+    
+    The per-type searches run concurrently and are merged into one list,
+    best matches first. A search still running when the client goes away
+    (e.g. the search box aborted it for a newer query) is cancelled.
+    """
+    entity_types = [entity_type.strip() for entity_type in types.split(",")] if types else list(SEARCHABLE)
+    unknown = [entity_type for entity_type in entity_types if entity_type not in SEARCHABLE]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search type: {', '.join(unknown)}")
+    
+    ranked = await _unless_disconnected(request, asyncio.gather(*(
+        _search_ranked(entity_type, q, limit) for entity_type in entity_types
+    )))
+    if ranked is None:
+        # Nobody is waiting for the response any more
+        return SearchResponse(query=q, results=[])
+    
+    merged = sorted(
+        (rank, order, position, entity_type, item)
+        for order, (entity_type, matches) in enumerate(zip(entity_types, ranked))
+        for position, (rank, item) in enumerate(matches)
+    )
+    return SearchResponse(query=q, results=[
+        SearchResult(type=entity_type, rank=rank[0], item=item)
+        for rank, _, _, entity_type, item in merged
+    ])
+
 
 @router.get("/doctors", response_model=List[UserResponse])
 async def search_doctors(
     q: str = Query(..., min_length=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Search doctors by name or department
     """
-    doctors = db.query(User).filter(
-        (User.name.ilike(f"%{q}%")) |
-        (User.department.ilike(f"%{q}%"))
-    ).filter(
-        User.status == "active"
-    ).limit(20).all()
-    
-    return doctors
+    return await _search(db, "user", q)
 
 
 @router.get("/devices", response_model=List[DeviceResponse])
 async def search_devices(
     q: str = Query(..., min_length=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Search devices by name or IP address
     """
-    devices = db.query(Device).filter(
-        (Device.name.ilike(f"%{q}%")) |
-        (Device.ip_address.ilike(f"%{q}%"))
-    ).filter(
-        Device.status == "active"
-    ).limit(20).all()
-    
-    return devices
+    return await _search(db, "device", q)
 
 
 @router.get("/patients", response_model=List[PatientResponse])
 async def search_patients(
     q: str = Query(..., min_length=1),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Search patients by ID or name
     """
-    patients = db.query(Patient).filter(
-        (Patient.id.ilike(f"%{q}%")) |
-        (Patient.name.ilike(f"%{q}%"))
-    ).filter(
-        Patient.status == "active"
-    ).limit(20).all()
-    
-    return patients
-
+    return await _search(db, "patient", q)
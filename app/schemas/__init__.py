@@ -4,7 +4,7 @@ Pydantic schemas for request/response validation
 
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime, date
-from typing import Optional, List
+from typing import Optional, List, Union
 
 
 # Base schemas
@@ -91,6 +91,22 @@ class AuditLogResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class AuditLogPage(BaseModel):
+    items: List[AuditLogResponse]
+    next_cursor: Optional[str] = None
+
+
+class SearchResult(BaseModel):
+    type: str  # user | device | patient
+    rank: int  # 0 = starts with the query, 1 = word prefix, 2 = other substring
+    item: Union[UserResponse, DeviceResponse, PatientResponse]
+
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchResult]
+
+
 class DashboardStats(BaseModel):
     total_events: int
     active_users: int
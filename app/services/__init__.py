@@ -3,6 +3,24 @@ Business logic services
 """
 
 from .auth_service import AuthService
+from .rollup_service import RollupService
+from .partition_service import PartitionService
+from .retention_service import RetentionService
+from .cold_storage import ColdStorage, cold_storage
+from .search_service import SearchService
+from .log_search import LogSearchService
+from .typeahead import TypeaheadIndex, typeahead_index
+from .entity_snapshot import EntitySnapshotCache, entity_cache
+from .log_broadcaster import LogBroadcaster, log_broadcaster
+from .subscriptions import SubscriptionRegistry, subscriptions
+from .outbound import OutboundQueues, outbound_queues
+from .replay import ReplayBuffer, replay_buffer
 
-__all__ = ["AuthService"]
-
+__all__ = [
+    "AuthService", "RollupService", "PartitionService", "RetentionService", "SearchService",
+    "LogSearchService",
+    "TypeaheadIndex", "typeahead_index",
+    "ColdStorage", "cold_storage", "EntitySnapshotCache", "entity_cache",
+    "LogBroadcaster", "log_broadcaster", "SubscriptionRegistry", "subscriptions",
+    "OutboundQueues", "outbound_queues", "ReplayBuffer", "replay_buffer",
+]
@@ -0,0 +1,420 @@
+"""
+Columnar cold storage tier for archived audit logs
+
+Logs older than the hot window are moved out of audit_logs into Parquet
+files laid out as COLD_STORAGE_DIR/day=YYYY-MM-DD/hospital_id=<id>/. The
+tiers never overlap: every archived day is older than anything left in
+audit_logs, so readers only need the cold tier once the hot rows run out.
+"""
+
+import heapq
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import quote
+from sqlalchemy import and_, delete, func, select, tuple_
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..database import SessionLocal, audit_logs_partitioned, engine
+from ..models import AuditLog
+from ..utils.logging import get_logger
+from .partition_service import PartitionService
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+logger = get_logger(__name__)
+
+audit_logs = AuditLog.__table__
+
+# Written in this order; hospital_id lives in the directory name
+COLUMNS = [
+    "id", "timestamp", "level", "event_type", "message", "user_id", "device_id", "patient_id",
+    "source_ip", "user_agent", "details", "accession_number", "study_instance_uid", "series_instance_uid",
+    "hl7_message_id", "modality", "floor", "clinic", "unit", "hl7_message_path", "dicom_path", "pdf_path",
+    "created_at",
+]
+
+
+def _schema():
+    return pa.schema([
+        ("id", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("level", pa.string()),
+        ("event_type", pa.string()),
+        ("message", pa.string()),
+        ("user_id", pa.string()),
+        ("device_id", pa.string()),
+        ("patient_id", pa.string()),
+        ("source_ip", pa.string()),
+        ("user_agent", pa.string()),
+        ("details", pa.string()),  # JSON text
+        ("accession_number", pa.string()),
+        ("study_instance_uid", pa.string()),
+        ("series_instance_uid", pa.string()),
+        ("hl7_message_id", pa.string()),
+        ("modality", pa.string()),
+        ("floor", pa.string()),
+        ("clinic", pa.string()),
+        ("unit", pa.string()),
+        ("hl7_message_path", pa.string()),
+        ("dicom_path", pa.string()),
+        ("pdf_path", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+
+
+def _dataset_schema():
+    """File columns plus the hospital_id directory key; files from before a column existed read it as null"""
+    return _schema().append(pa.field("hospital_id", pa.string()))
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([("hospital_id", pa.string())]), flavor="hive")
+
+
+def _value(field):
+    """Plain string value of an enum member or string"""
+    return getattr(field, "value", field)
+
+
+def _to_record(row: Dict) -> Dict:
+    """Parquet record for an audit_logs row"""
+    record = {column: _value(row[column]) for column in COLUMNS}
+    if record["details"] is not None:
+        record["details"] = json.dumps(record["details"], ensure_ascii=False)
+    return record
+
+
+def _sorted_records(dataset, batch_size: int, expression=None) -> Iterator[Tuple]:
+    """
+    (timestamp, id, record) for a dataset's rows in (timestamp, id) order
+    
+    Every file is written sorted, so the files are read a batch at a time
+    and merged rather than loaded and sorted.
+    """
+    def file_records(fragment):
+        for batch in fragment.to_batches(schema=dataset.schema, filter=expression, batch_size=batch_size):
+            for record in batch.to_pylist():
+                yield record["timestamp"], record["id"], record
+    
+    return heapq.merge(*(file_records(fragment) for fragment in dataset.get_fragments(filter=expression)))
+
+
+def _to_log(record: Dict) -> Dict:
+    """API-shaped log for a Parquet record"""
+    if record.get("details") is not None:
+        record["details"] = json.loads(record["details"])
+    return record
+
+
+class ColdStorage:
+    """Parquet files of archived audit logs, partitioned by day and hospital"""
+    
+    def __init__(self, root: str):
+        self.root = Path(root)
+    
+    @property
+    def enabled(self) -> bool:
+        """pyarrow is installed and at least one day has been archived"""
+        return pa is not None and bool(self.days())
+    
+    def days(self) -> List[date]:
+        """Archived days, oldest first"""
+        if not self.root.is_dir():
+            return []
+        return sorted(
+            date.fromisoformat(entry.name[len("day="):])
+            for entry in os.scandir(self.root)
+            if entry.is_dir() and entry.name.startswith("day=")
+        )
+    
+    def boundary(self) -> Optional[datetime]:
+        """Start of the day after the newest archived day (hot rows are at or after it)"""
+        days = self.days()
+        if not days:
+            return None
+        return datetime.combine(days[-1] + timedelta(days=1), datetime.min.time())
+    
+    def oldest_timestamp(self) -> Optional[datetime]:
+        """Timestamp of the oldest archived log"""
+        days = self.days()
+        if not days:
+            return None
+        return pc.min(self._dataset(days[0]).to_table(columns=["timestamp"])["timestamp"]).as_py()
+    
+    def _day_dir(self, day: date) -> Path:
+        return self.root / f"day={day.isoformat()}"
+    
+    def _dataset(self, day: date):
+        return ds.dataset(self._day_dir(day), format="parquet", partitioning=_partitioning(), schema=_dataset_schema())
+    
+    def _days_between(self, start: Optional[datetime], end: Optional[datetime]) -> List[date]:
+        return [
+            day for day in self.days()
+            if (start is None or day >= start.date()) and (end is None or day <= end.date())
+        ]
+    
+    # Writing
+    
+    def write_day(self, day: date, rows: Iterable[Dict]) -> List[str]:
+        """
+        Store one day of audit_logs rows, one file per hospital
+        
+        Rows must arrive in (timestamp, id) order. They are streamed to each
+        hospital's file a row group at a time, so files stay sorted and only
+        one row group per hospital is held in memory. Rows already stored for
+        that day and hospital are merged in (by id), so archiving a day again
+        after an interrupted run neither loses nor duplicates logs. Files are
+        replaced atomically. Returns the ids written.
+        """
+        schema = _schema()
+        row_group_size = settings.COLD_STORAGE_ROW_GROUP_SIZE
+        pending = defaultdict(list)
+        writers = {}
+        ids = []
+        
+        def flush(hospital_id):
+            if hospital_id not in writers:
+                directory = self._day_dir(day) / f"hospital_id={quote(hospital_id, safe='')}"
+                directory.mkdir(parents=True, exist_ok=True)
+                writers[hospital_id] = pq.ParquetWriter(directory / "part-0.parquet.tmp", schema, compression="zstd")
+            writers[hospital_id].write_table(
+                pa.Table.from_pylist(pending.pop(hospital_id), schema=schema), row_group_size=row_group_size
+            )
+        
+        try:
+            for row in rows:
+                ids.append(row["id"])
+                pending[row["hospital_id"]].append(_to_record(row))
+                if len(pending[row["hospital_id"]]) >= row_group_size:
+                    flush(row["hospital_id"])
+            for hospital_id in list(pending):
+                flush(hospital_id)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        
+        new_ids = set(ids)
+        for hospital_id in writers:
+            directory = self._day_dir(day) / f"hospital_id={quote(hospital_id, safe='')}"
+            path, tmp_path = directory / "part-0.parquet", directory / "part-0.parquet.tmp"
+            if path.exists():
+                self._merge_existing(path, tmp_path, schema, new_ids)
+            os.replace(tmp_path, path)
+        return ids
+    
+    @staticmethod
+    def _merge_existing(path: Path, tmp_path: Path, schema, new_ids: Set[str]):
+        """
+        Fold the logs of an earlier run at `path` into the new file at `tmp_path`, new rows winning
+        
+        Both files are sorted, so they are merged a row group at a time into
+        a third file that then replaces `tmp_path`.
+        """
+        row_group_size = settings.COLD_STORAGE_ROW_GROUP_SIZE
+        existing = (
+            item for item in _sorted_records(ds.dataset(path, format="parquet", schema=schema), row_group_size)
+            if item[1] not in new_ids
+        )
+        new = _sorted_records(ds.dataset(tmp_path, format="parquet", schema=schema), row_group_size)
+        merged_path = tmp_path.with_name("part-0.parquet.merge")
+        
+        buffer = []
+        with pq.ParquetWriter(merged_path, schema, compression="zstd") as writer:
+            for _, _, record in heapq.merge(new, existing):
+                buffer.append(record)
+                if len(buffer) >= row_group_size:
+                    writer.write_table(pa.Table.from_pylist(buffer, schema=schema))
+                    buffer = []
+            if buffer:
+                writer.write_table(pa.Table.from_pylist(buffer, schema=schema))
+        os.replace(merged_path, tmp_path)
+    
+    @staticmethod
+    def _day_rows(db: Session, day_start: datetime, day_end: datetime, batch_size: int) -> Iterator[Dict]:
+        """
+        One day of audit_logs rows in (timestamp, id) order, batch_size per query
+        
+        The session is committed after every batch so the connection goes
+        back to the pool (on SQLite, the single writer connection) while the
+        batch is written out.
+        """
+        position = None
+        while True:
+            query = select(audit_logs).where(
+                and_(audit_logs.c.timestamp >= day_start, audit_logs.c.timestamp < day_end)
+            )
+            if position is not None:
+                query = query.where(tuple_(audit_logs.c.timestamp, audit_logs.c.id) > tuple_(*position))
+            rows = db.execute(query.order_by(audit_logs.c.timestamp, audit_logs.c.id).limit(batch_size)).mappings().all()
+            db.commit()
+            
+            for row in rows:
+                yield dict(row)
+            if len(rows) < batch_size:
+                return
+            position = (rows[-1]["timestamp"], rows[-1]["id"])
+            # Let the live generator in between batches
+            time.sleep(settings.RETENTION_BATCH_PAUSE)
+    
+    def archive_before(self, db: Session, cutoff: datetime, batch_size: Optional[int] = None) -> int:
+        """
+        Move audit logs older than the start of cutoff's day to Parquet
+        
+        Works one day at a time, like RetentionService: the day's rows are
+        read in batches and streamed to Parquet, then deleted from audit_logs
+        by id in batches, committing after each batch so the writer
+        connection is never held for long. Returns the number of logs moved.
+        """
+        if pa is None:
+            raise RuntimeError("pyarrow is required for the cold storage tier")
+        
+        batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+        cutoff = datetime.combine(cutoff.date(), datetime.min.time())
+        oldest = db.execute(select(func.min(audit_logs.c.timestamp))).scalar()
+        
+        moved = 0
+        day = oldest.date() if oldest else cutoff.date()
+        while day < cutoff.date():
+            day_start = datetime.combine(day, datetime.min.time())
+            day_end = day_start + timedelta(days=1)
+            ids = self.write_day(day, self._day_rows(db, day_start, day_end, batch_size))
+            
+            if ids:
+                for offset in range(0, len(ids), batch_size):
+                    db.execute(delete(audit_logs).where(audit_logs.c.id.in_(ids[offset:offset + batch_size])))
+                    db.commit()
+                    time.sleep(settings.RETENTION_BATCH_PAUSE)
+                moved += len(ids)
+                logger.info(f"Archived {len(ids)} logs from {day} to cold storage")
+            day += timedelta(days=1)
+        
+        if audit_logs_partitioned and moved:
+            PartitionService.drop_partitions_before(engine, cutoff)
+        return moved
+    
+    # Reading
+    
+    def _filter(
+        self,
+        hospital_id: Optional[str] = None,
+        level: Optional[str] = None,
+        event_type: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ):
+        """Dataset expression for the /api/logs filters (pushed down to Parquet)"""
+        expression = ds.scalar(True)
+        if hospital_id and hospital_id != "all":
+            expression &= ds.field("hospital_id") == hospital_id
+        if level:
+            expression &= ds.field("level") == level
+        if event_type:
+            expression &= ds.field("event_type") == event_type
+        if start is not None:
+            expression &= ds.field("timestamp") >= start
+        if end is not None:
+            expression &= ds.field("timestamp") <= end
+        return expression
+    
+    def query_logs(
+        self,
+        limit: int,
+        before: Optional[Tuple[datetime, str]] = None,
+        **filters
+    ) -> List[Dict]:
+        """
+        Newest archived logs matching filters, ordered by (timestamp, id) desc
+        
+        `before` is a keyset position; only older logs are returned. Days are
+        read newest first and reading stops once `limit` logs are found.
+        """
+        expression = self._filter(**filters)
+        end = filters.get("end")
+        if before is not None:
+            before_timestamp, before_id = before
+            expression &= (ds.field("timestamp") < before_timestamp) | (
+                (ds.field("timestamp") == before_timestamp) & (ds.field("id") < before_id)
+            )
+            end = min(end, before_timestamp) if end else before_timestamp
+        
+        logs = []
+        for day in reversed(self._days_between(filters.get("start"), end)):
+            table = self._dataset(day).to_table(filter=expression)
+            if table.num_rows == 0:
+                continue
+            table = table.sort_by([("timestamp", "descending"), ("id", "descending")])
+            logs.extend(_to_log(record) for record in table.slice(0, limit - len(logs)).to_pylist())
+            if len(logs) >= limit:
+                break
+        return logs
+    
+    def iter_logs(self, batch_size: int = 1000, **filters) -> Iterator[Dict]:
+        """Archived logs matching filters, oldest first, read a batch at a time"""
+        expression = self._filter(**filters)
+        for day in self._days_between(filters.get("start"), filters.get("end")):
+            for _, _, record in _sorted_records(self._dataset(day), batch_size, expression):
+                yield _to_log(record)
+    
+    def bucket_counts(
+        self,
+        start: datetime,
+        end: datetime,
+        seconds: int,
+        hospital_id: Optional[str] = None
+    ) -> Dict[datetime, int]:
+        """Log counts per epoch-aligned bucket of `seconds`, reading only timestamps"""
+        expression = self._filter(hospital_id=hospital_id, start=start, end=end)
+        counts = defaultdict(int)
+        for day in self._days_between(start, end):
+            timestamps = self._dataset(day).to_table(columns=["timestamp"], filter=expression)["timestamp"]
+            if len(timestamps) == 0:
+                continue
+            buckets = pc.floor_temporal(timestamps, multiple=seconds, unit="second")
+            grouped = pa.table({"bucket": buckets}).group_by("bucket").aggregate([([], "count_all")])
+            for bucket, count in zip(grouped["bucket"].to_pylist(), grouped["count_all"].to_pylist()):
+                counts[bucket] += count
+        return counts
+    
+    def hourly_counts(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Dict[Tuple, int]:
+        """Counts per (hospital_id, hour, level, event_type), as in audit_hourly_rollup"""
+        expression = self._filter(start=since)
+        if until is not None:
+            expression &= ds.field("timestamp") < until
+        
+        counts = defaultdict(int)
+        for day in self._days_between(since, until):
+            table = self._dataset(day).to_table(
+                columns=["hospital_id", "timestamp", "level", "event_type"], filter=expression
+            )
+            if table.num_rows == 0:
+                continue
+            table = table.append_column("hour", pc.floor_temporal(table["timestamp"], unit="hour"))
+            grouped = table.group_by(["hospital_id", "hour", "level", "event_type"]).aggregate([([], "count_all")])
+            for row in grouped.to_pylist():
+                counts[(row["hospital_id"], row["hour"], row["level"], row["event_type"])] += row["count_all"]
+        return counts
+    
+    def run(self):
+        """Scheduled job: move logs past COLD_STORAGE_AFTER_DAYS out of audit_logs"""
+        db = SessionLocal()
+        try:
+            self.archive_before(db, datetime.utcnow() - timedelta(days=settings.COLD_STORAGE_AFTER_DAYS))
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Cold storage archiving failed: {e}")
+        finally:
+            db.close()
+
+
+cold_storage = ColdStorage(settings.COLD_STORAGE_DIR)
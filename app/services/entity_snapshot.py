@@ -0,0 +1,127 @@
+"""
+In-process snapshot of the entities used for event generation
+"""
+
+import threading
+import time
+from itertools import chain
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..models import Hospital, User, Device, Patient
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+ENTITY_MODELS = (Hospital, User, Device, Patient)
+
+
+def load_entity_dicts(db: Session) -> Optional[Dict[str, List[Dict]]]:
+    """Plain dict copies of the entities the event generator draws from"""
+    hospitals = db.query(Hospital).all()
+    users = db.query(User).all()
+    devices = db.query(Device).all()
+    patients = db.query(Patient).all()
+    
+    if not all([hospitals, users, devices, patients]):
+        return None
+    
+    # Convert to dicts for generator (include clinic from device_metadata)
+    return {
+        "hospitals": [{"id": h.id, "name": h.name} for h in hospitals],
+        "users": [{"id": u.id, "name": u.name} for u in users],
+        "devices": [
+            {
+                "id": d.id,
+                "name": d.name,
+                "type": d.type,
+                "clinic": d.device_metadata.get("clinic") if d.device_metadata else None
+            }
+            for d in devices
+        ],
+        "patients": [{"id": p.id, "name": p.name} for p in patients],
+    }
+
+
+class EntitySnapshot:
+    """Entity dicts as loaded at one version of the cache"""
+    
+    def __init__(self, version: int, entities: Dict[str, List[Dict]], loaded_at: float):
+        self.version = version
+        self.entities = entities
+        self.loaded_at = loaded_at
+
+
+class EntitySnapshotCache:
+    """
+    Shares one EntitySnapshot between the seeder and the real-time generator
+    
+    The version is bumped whenever a committed session changed a hospital,
+    user, device or patient; a snapshot is reloaded when its version is
+    stale or it is older than ttl seconds.
+    """
+    
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = 0
+        self._snapshot: Optional[EntitySnapshot] = None
+    
+    @property
+    def version(self) -> int:
+        return self._version
+    
+    def invalidate(self):
+        """Mark the current snapshot as stale"""
+        with self._lock:
+            self._version += 1
+    
+    def get(self, db: Session) -> Optional[EntitySnapshot]:
+        """Current snapshot, reloaded through db if stale; None if entities are missing"""
+        with self._lock:
+            snapshot = self._snapshot
+            version = self._version
+        
+        if (
+            snapshot is not None
+            and snapshot.version == version
+            and time.monotonic() - snapshot.loaded_at < self.ttl
+        ):
+            return snapshot
+        
+        entities = load_entity_dicts(db)
+        if entities is None:
+            return None
+        
+        snapshot = EntitySnapshot(version, entities, time.monotonic())
+        with self._lock:
+            # Don't publish a snapshot that was invalidated while loading
+            if version == self._version:
+                self._snapshot = snapshot
+        
+        logger.debug(f"Loaded entity snapshot version {version}")
+        return snapshot
+
+
+entity_cache = EntitySnapshotCache(ttl=settings.ENTITY_SNAPSHOT_TTL)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_entity_changes(session, flush_context):
+    """Remember that this transaction touched an entity model"""
+    if any(isinstance(obj, ENTITY_MODELS) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info["entities_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    """Invalidate the snapshot once entity changes are visible to other sessions"""
+    if session.info.pop("entities_changed", False):
+        entity_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    """Forget entity changes that were rolled back"""
+    session.info.pop("entities_changed", None)
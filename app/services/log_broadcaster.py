@@ -0,0 +1,101 @@
+"""
+Bridge from the background generator thread to Socket.IO broadcasts
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+from ..config import settings
+from ..schemas import AuditLogResponse
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+EmitBatch = Callable[[List[Dict]], Awaitable[None]]
+
+
+def serialize_log(log) -> Dict:
+    """JSON-ready payload for an AuditLog row or generated event dict"""
+    return AuditLogResponse.model_validate(log).model_dump(mode="json")
+
+
+class LogBroadcaster:
+    """
+    Collects new audit logs from any thread and emits them in micro-batches
+    
+    publish() is safe to call from the APScheduler thread; logs are handed
+    to the event loop with call_soon_threadsafe and flushed to `emit` when
+    max_batch_size logs are pending or flush_interval seconds have passed
+    since the first one arrived.
+    """
+    
+    def __init__(self, flush_interval: float, max_batch_size: int, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._emit: Optional[EmitBatch] = None
+    
+    def start(self, emit: EmitBatch):
+        """Start flushing on the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._emit = emit
+        self._task = self._loop.create_task(self._run())
+    
+    async def stop(self):
+        """Stop flushing; logs still pending are discarded"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._loop = self._queue = self._task = None
+    
+    def publish(self, log_data: Dict):
+        """Queue a log for broadcasting; no-op until start() has been called"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._enqueue, serialize_log(log_data))
+    
+    def _enqueue(self, payload: Dict):
+        """Put a payload on the queue from the event loop thread"""
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Live log queue full, dropped {self.dropped} logs so far")
+    
+    async def _run(self):
+        """Flush loop: wait for a first log, then gather a batch until full or timed out"""
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.flush_interval
+            
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                await self._emit(batch)
+            except Exception as e:
+                logger.error(f"Error broadcasting {len(batch)} logs: {e}")
+
+
+log_broadcaster = LogBroadcaster(
+    flush_interval=settings.LIVE_FLUSH_INTERVAL,
+    max_batch_size=settings.LIVE_MAX_BATCH_SIZE,
+    max_pending=settings.LIVE_MAX_PENDING
+)
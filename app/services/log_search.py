@@ -0,0 +1,83 @@
+"""
+Full-text and details lookups over audit logs
+"""
+
+from typing import Dict, Optional
+from sqlalchemy import column, func, literal_column, select, table, text
+from ..models import AuditLog
+from ..models.audit import AUDIT_LOG_FTS_DDL, AUDIT_LOG_FTS_TABLES, AUDIT_LOG_FTS_TRIGGERS, message_tsvector
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+audit_logs_fts = table("audit_logs_fts", column("rowid"))
+audit_logs_fts_keys = table("audit_logs_fts_keys", column("fts_rowid"), column("log_id"))
+
+
+class LogSearchService:
+    """Builds indexed search conditions over audit_logs"""
+    
+    @staticmethod
+    def rebuild(connection):
+        """Recreate the SQLite FTS tables and triggers and reindex every message"""
+        if connection.dialect.name != "sqlite":
+            return
+        for trigger in AUDIT_LOG_FTS_TRIGGERS:
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        for table_name in AUDIT_LOG_FTS_TABLES:
+            connection.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+        for statement in AUDIT_LOG_FTS_DDL:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO audit_logs_fts_keys(log_id) SELECT id FROM audit_logs"))
+        connection.execute(text(
+            "INSERT INTO audit_logs_fts(rowid, message) "
+            "SELECT audit_logs_fts_keys.fts_rowid, audit_logs.message "
+            "FROM audit_logs_fts_keys JOIN audit_logs ON audit_logs.id = audit_logs_fts_keys.log_id"
+        ))
+        logger.info("Rebuilt audit_logs_fts")
+    
+    @staticmethod
+    def ensure_built(connection):
+        """
+        Build the FTS tables once for SQLite databases created without them
+        
+        Databases indexed on the audit_logs rowid (before audit_logs_fts_keys
+        existed) are rebuilt too.
+        """
+        if connection.dialect.name != "sqlite":
+            return
+        exists = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'audit_logs_fts_keys'")).first()
+        if exists is None:
+            LogSearchService.rebuild(connection)
+    
+    @staticmethod
+    def match_query(q: str) -> str:
+        """FTS5 query requiring every word of q, each quoted so it is taken literally"""
+        return " ".join('"' + word.replace('"', '""') + '"' for word in q.split())
+    
+    @staticmethod
+    def text_condition(q: str, dialect_name: str):
+        """
+        Condition matching logs whose message contains every word of q
+        
+        Words match whole tokens, case-insensitively; on SQLite accents are
+        ignored as well.
+        """
+        if dialect_name == "sqlite":
+            matches = select(audit_logs_fts_keys.c.log_id).join(
+                audit_logs_fts, audit_logs_fts.c.rowid == audit_logs_fts_keys.c.fts_rowid
+            ).where(
+                text("audit_logs_fts MATCH :log_query").bindparams(log_query=LogSearchService.match_query(q))
+            )
+            return AuditLog.id.in_(matches)
+        return message_tsvector(AuditLog.message).op("@@")(func.plainto_tsquery(literal_column("'simple'"), q))
+    
+    @staticmethod
+    def apply(query, dialect_name: str, q: Optional[str] = None, details: Optional[Dict[str, Optional[str]]] = None):
+        """Add message and promoted details column conditions to a select over AuditLog"""
+        if q and q.strip():
+            query = query.where(LogSearchService.text_condition(q, dialect_name))
+        for name, value in (details or {}).items():
+            if value:
+                query = query.where(getattr(AuditLog, name) == value)
+        return query
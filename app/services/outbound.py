@@ -0,0 +1,214 @@
+"""
+Bounded per-subscriber outbound queues for live log fan-out
+"""
+
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+from ..config import settings
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "resync", "disconnect")
+
+SendFunc = Callable[[str, str, object], Awaitable[None]]
+DisconnectFunc = Callable[[str], Awaitable[None]]
+
+
+class SubscriberQueue:
+    """Logs waiting to be sent to one sid"""
+    
+    def __init__(self, sid: str):
+        self.sid = sid
+        self.logs = deque()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        # Backlog collapsed by the resync policy and not yet reported
+        self.skipped = 0
+        self.skipped_from: Optional[str] = None
+        self.skipped_to: Optional[str] = None
+        # Replay position lost, the client has to reload everything
+        self.resync = False
+    
+    def collapse(self):
+        """Replace the backlog with a skipped-events marker"""
+        if not self.logs:
+            return
+        if self.skipped_from is None:
+            self.skipped_from = self.logs[0].get("timestamp")
+        self.skipped_to = self.logs[-1].get("timestamp")
+        self.skipped += len(self.logs)
+        self.logs.clear()
+
+
+class OutboundQueues:
+    """
+    Per-sid bounded queues drained by one sender task per subscriber
+    
+    send() is expected to wait for the client to acknowledge a batch, so a
+    slow tab only ever has one batch in flight and its backlog stays here,
+    capped at max_size. On overflow the policy decides what gives:
+    drop_oldest discards the oldest queued log, resync collapses the backlog
+    into a single logs_skipped message with the time range to re-fetch from
+    /api/logs/page, and disconnect drops the client.
+    """
+    
+    def __init__(self, max_size: int, max_batch_size: int, policy: str):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_size = max_size
+        self.max_batch_size = max_batch_size
+        self.policy = policy
+        self.dropped = 0
+        self.skipped = 0
+        self.disconnected = 0
+        self.resyncs = 0
+        self.send_failures = 0
+        self.unacknowledged = 0
+        self._queues: Dict[str, SubscriberQueue] = {}
+        self._send: Optional[SendFunc] = None
+        self._disconnect: Optional[DisconnectFunc] = None
+    
+    def start(self, send: SendFunc, disconnect: DisconnectFunc):
+        """Set the coroutines used to deliver events and drop clients"""
+        self._send = send
+        self._disconnect = disconnect
+    
+    async def stop(self):
+        """Cancel every sender task and discard the queues"""
+        queues, self._queues = list(self._queues.values()), {}
+        tasks = [queue.task for queue in queues if queue.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def attach(self, sid: str):
+        """Create the queue and sender task for sid if it has none"""
+        if sid in self._queues:
+            return
+        queue = SubscriberQueue(sid)
+        queue.task = asyncio.get_running_loop().create_task(self._drain(queue))
+        self._queues[sid] = queue
+    
+    def detach(self, sid: str):
+        """Discard sid's queue and stop its sender"""
+        queue = self._queues.pop(sid, None)
+        if queue and queue.task:
+            queue.task.cancel()
+    
+    def enqueue(self, sid: str, logs: List[Dict]):
+        """Queue logs for sid, applying the overflow policy"""
+        queue = self._queues.get(sid)
+        if queue is None:
+            return
+        
+        for log in logs:
+            if len(queue.logs) >= self.max_size:
+                if self.policy == "drop_oldest":
+                    queue.logs.popleft()
+                    self.dropped += 1
+                elif self.policy == "resync":
+                    self.skipped += len(queue.logs)
+                    queue.collapse()
+                else:
+                    self._drop_client(queue)
+                    return
+            queue.logs.append(log)
+        
+        queue.wakeup.set()
+    
+    def report_skipped(self, sid: str, count: int, start_date: Optional[str], end_date: Optional[str]):
+        """Tell sid that `count` logs in a time range were not delivered"""
+        queue = self._queues.get(sid)
+        if queue is None or count <= 0:
+            return
+        if queue.skipped_from is None:
+            queue.skipped_from = start_date
+        queue.skipped_to = end_date
+        queue.skipped += count
+        self.skipped += count
+        queue.wakeup.set()
+    
+    def report_resync(self, sid: str):
+        """Tell sid that an unknown number of logs were not delivered"""
+        queue = self._queues.get(sid)
+        if queue is None:
+            return
+        queue.resync = True
+        self.resyncs += 1
+        queue.wakeup.set()
+    
+    def _drop_client(self, queue: SubscriberQueue):
+        """Disconnect a subscriber that fell too far behind"""
+        logger.warning(f"Disconnecting slow log subscriber {queue.sid} ({len(queue.logs)} logs queued)")
+        self.disconnected += 1
+        self.detach(queue.sid)
+        asyncio.get_running_loop().create_task(self._disconnect(queue.sid))
+    
+    async def _drain(self, queue: SubscriberQueue):
+        """Send queued logs to one subscriber, one batch in flight at a time"""
+        while True:
+            await queue.wakeup.wait()
+            queue.wakeup.clear()
+            
+            while queue.resync or queue.skipped or queue.logs:
+                event, size = None, 0
+                try:
+                    if queue.resync:
+                        # No count or range: the client reloads from scratch
+                        message = {"skipped": None, "start_date": None, "end_date": None}
+                        queue.resync = False
+                        queue.skipped, queue.skipped_from, queue.skipped_to = 0, None, None
+                        event, size = "logs_skipped", 0
+                        await self._send(queue.sid, event, message)
+                    elif queue.skipped:
+                        message = {
+                            "skipped": queue.skipped,
+                            "start_date": queue.skipped_from,
+                            "end_date": queue.skipped_to,
+                        }
+                        queue.skipped, queue.skipped_from, queue.skipped_to = 0, None, None
+                        event, size = "logs_skipped", 0
+                        await self._send(queue.sid, event, message)
+                    
+                    if queue.logs:
+                        count = min(len(queue.logs), self.max_batch_size)
+                        batch = [queue.logs.popleft() for _ in range(count)]
+                        event, size = "new_logs", count
+                        await self._send(queue.sid, event, batch)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Unacknowledged batches are not retried; the queue bound
+                    # and overflow policy take care of a stalled client
+                    self.send_failures += 1
+                    self.unacknowledged += size
+                    logger.warning(
+                        f"{event} to log subscriber {queue.sid} not acknowledged "
+                        f"({size} logs lost): {e!r}"
+                    )
+    
+    def stats(self) -> Dict:
+        """Queue depth and overflow counters"""
+        depths = [len(queue.logs) for queue in self._queues.values()]
+        return {
+            "subscribers": len(depths),
+            "queued": sum(depths),
+            "max_depth": max(depths, default=0),
+            "max_size": self.max_size,
+            "policy": self.policy,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+            "disconnected": self.disconnected,
+            "resyncs": self.resyncs,
+            "send_failures": self.send_failures,
+            "unacknowledged": self.unacknowledged,
+        }
+
+
+outbound_queues = OutboundQueues(
+    max_size=settings.LIVE_QUEUE_SIZE,
+    max_batch_size=settings.LIVE_MAX_BATCH_SIZE,
+    policy=settings.LIVE_OVERFLOW_POLICY
+)
@@ -0,0 +1,214 @@
+"""
+Monthly range partitions of audit_logs (PostgreSQL)
+"""
+
+import re
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from ..config import settings
+from ..database import audit_logs_partitioned
+from ..models import AuditLog
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+PARENT_TABLE = "audit_logs"
+LEGACY_PARTITION = "audit_logs_legacy"
+
+_BOUND_PATTERN = re.compile(r"FROM \((MINVALUE|'[^']+')\) TO \((MAXVALUE|'[^']+')\)")
+
+
+class Partition(NamedTuple):
+    """One attached partition; None bounds stand for MINVALUE/MAXVALUE"""
+    name: str
+    lower: Optional[datetime]
+    upper: Optional[datetime]
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+class PartitionService:
+    """Creates upcoming audit_logs partitions and drops expired ones"""
+    
+    @staticmethod
+    def month_start(timestamp: datetime) -> datetime:
+        """Truncate a timestamp to the first instant of its month"""
+        return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    
+    @staticmethod
+    def add_months(month: datetime, months: int) -> datetime:
+        """Shift a month start by a (possibly negative) number of months"""
+        index = month.year * 12 + month.month - 1 + months
+        return month.replace(year=index // 12, month=index % 12 + 1)
+    
+    @staticmethod
+    def partition_name(month: datetime) -> str:
+        return f"{PARENT_TABLE}_p{month:%Y_%m}"
+    
+    @staticmethod
+    def is_partitioned(connection: Connection) -> bool:
+        """Whether audit_logs exists as a partitioned table"""
+        return connection.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+        ), {"table": PARENT_TABLE}).scalar()
+    
+    @staticmethod
+    def list_partitions(connection: Connection) -> List[Partition]:
+        """Attached partitions ordered by lower bound"""
+        rows = connection.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ), {"table": PARENT_TABLE}).all()
+        
+        partitions = []
+        for name, bound in rows:
+            match = _BOUND_PATTERN.search(bound)
+            if match is None:
+                continue
+            partitions.append(Partition(name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+        return sorted(partitions, key=lambda partition: partition.lower or datetime.min)
+    
+    @staticmethod
+    def ensure_partitions(engine: Engine, since: Optional[datetime] = None, months_ahead: Optional[int] = None) -> List[str]:
+        """
+        Create missing monthly partitions
+        
+        Covers the month of `since` (default: now) through `months_ahead`
+        months after the current one. Months already covered by an existing
+        partition are skipped. Returns the names of created partitions.
+        """
+        if months_ahead is None:
+            months_ahead = settings.AUDIT_LOG_PARTITIONS_AHEAD
+        
+        current = PartitionService.month_start(datetime.utcnow())
+        month = PartitionService.month_start(since) if since else current
+        last = PartitionService.add_months(current, months_ahead)
+        
+        created = []
+        with engine.begin() as connection:
+            if not PartitionService.is_partitioned(connection):
+                logger.warning("audit_logs is not partitioned; run `python -m app.manage partition-logs` first")
+                return created
+            
+            existing = PartitionService.list_partitions(connection)
+            while month <= last:
+                upper = PartitionService.add_months(month, 1)
+                overlaps = any(
+                    (partition.lower is None or partition.lower < upper)
+                    and (partition.upper is None or partition.upper > month)
+                    for partition in existing
+                )
+                if not overlaps:
+                    name = PartitionService.partition_name(month)
+                    connection.execute(text(
+                        f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+                        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+                    ))
+                    created.append(name)
+                month = upper
+        
+        if created:
+            logger.info(f"Created audit_logs partitions: {', '.join(created)}")
+        return created
+    
+    @staticmethod
+    def drop_partitions_before(engine: Engine, cutoff: datetime) -> List[str]:
+        """
+        Drop partitions whose whole range lies before cutoff
+        
+        Dropping a partition removes its rows without a DELETE or VACUUM.
+        The hourly rollup is left as is, so analytics keep the history.
+        Returns the names of dropped partitions.
+        """
+        dropped = []
+        with engine.begin() as connection:
+            if not PartitionService.is_partitioned(connection):
+                return dropped
+            
+            for partition in PartitionService.list_partitions(connection):
+                if partition.upper is not None and partition.upper <= cutoff:
+                    connection.execute(text(f"DROP TABLE {partition.name}"))
+                    dropped.append(partition.name)
+        
+        if dropped:
+            logger.info(f"Dropped audit_logs partitions: {', '.join(dropped)}")
+        return dropped
+    
+    @staticmethod
+    def maintain(engine: Engine):
+        """Periodic job: keep upcoming partitions ready and apply retention"""
+        PartitionService.ensure_partitions(engine)
+        
+        if settings.AUDIT_LOG_PARTITION_RETENTION_MONTHS is not None:
+            current = PartitionService.month_start(datetime.utcnow())
+            cutoff = PartitionService.add_months(current, -settings.AUDIT_LOG_PARTITION_RETENTION_MONTHS)
+            PartitionService.drop_partitions_before(engine, cutoff)
+    
+    @staticmethod
+    def convert(engine: Engine) -> Optional[datetime]:
+        """
+        Turn an existing unpartitioned audit_logs into a partitioned one
+        
+        Rows are not copied: the old table is renamed and attached as a
+        single partition holding everything before the month after its
+        newest row, and monthly partitions follow from there. The old
+        partition can be dropped once all of it is past retention. The old
+        table's primary key is rebuilt as (id, timestamp) to match the
+        parent, and attaching scans it and builds the parent's indexes on
+        it, so run this in a maintenance window. Returns the boundary
+        between the old table and the monthly partitions, or None if
+        nothing was converted.
+        """
+        if not audit_logs_partitioned:
+            raise RuntimeError("Set AUDIT_LOG_PARTITIONING=true on a PostgreSQL database to partition audit_logs")
+        
+        with engine.begin() as connection:
+            if PartitionService.is_partitioned(connection):
+                logger.info("audit_logs is already partitioned")
+                return None
+            
+            newest = connection.execute(text(f'SELECT max("timestamp") FROM {PARENT_TABLE}')).scalar()
+            connection.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_PARTITION}"))
+            
+            # Index names are schema-wide; free them for the new parent table
+            # (audit_logs_pkey -> audit_logs_legacy_pkey, ix_audit_logs_x -> ix_audit_logs_legacy_x)
+            index_names = connection.execute(text(
+                "SELECT indexname FROM pg_indexes WHERE tablename = :table"
+            ), {"table": LEGACY_PARTITION}).scalars().all()
+            for index_name in index_names:
+                if PARENT_TABLE in index_name:
+                    legacy_name = index_name.replace(PARENT_TABLE, LEGACY_PARTITION, 1)
+                    connection.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{legacy_name}"'))
+            
+            # A partition's primary key must match the parent's (id, timestamp)
+            primary_key = connection.execute(text(
+                "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'p'"
+            ), {"table": LEGACY_PARTITION}).scalar()
+            if primary_key is not None:
+                connection.execute(text(f'ALTER TABLE {LEGACY_PARTITION} DROP CONSTRAINT "{primary_key}"'))
+            connection.execute(text(
+                f'ALTER TABLE {LEGACY_PARTITION} ADD CONSTRAINT {LEGACY_PARTITION}_pkey PRIMARY KEY (id, "timestamp")'
+            ))
+            
+            AuditLog.__table__.create(connection, checkfirst=True)
+            
+            if newest is None:
+                connection.execute(text(f"DROP TABLE {LEGACY_PARTITION}"))
+                boundary = PartitionService.month_start(datetime.utcnow())
+            else:
+                boundary = PartitionService.add_months(PartitionService.month_start(newest), 1)
+                connection.execute(text(
+                    f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {LEGACY_PARTITION} "
+                    f"FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat()}')"
+                ))
+        
+        logger.info(f"audit_logs partitioned by month from {boundary:%Y-%m}")
+        PartitionService.ensure_partitions(engine, since=boundary)
+        return boundary
@@ -0,0 +1,112 @@
+"""
+Replay of missed live logs for reconnecting subscribers
+"""
+
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import desc, func, tuple_
+from ..config import settings
+from ..database import ReadSessionLocal
+from ..models import AuditLog
+from .log_broadcaster import serialize_log
+from .subscriptions import LEVEL_RANK, LogFilter
+
+
+def _timestamp(log: Dict) -> datetime:
+    return datetime.fromisoformat(log["timestamp"])
+
+
+class ReplayBuffer:
+    """Ring buffer of the most recently broadcast logs, oldest first"""
+    
+    def __init__(self, capacity: int):
+        self._lock = threading.Lock()
+        self._logs = deque(maxlen=capacity)
+    
+    def extend(self, logs: List[Dict]):
+        """Remember a broadcast batch"""
+        with self._lock:
+            self._logs.extend(logs)
+    
+    def since(self, last_seen_id: Optional[str], last_seen_timestamp: Optional[datetime]) -> Optional[List[Dict]]:
+        """
+        Logs broadcast after the given position
+        
+        Returns None when the buffer no longer reaches back that far and the
+        caller has to fall back to the database.
+        """
+        with self._lock:
+            logs = list(self._logs)
+        
+        if last_seen_id:
+            for index in range(len(logs) - 1, -1, -1):
+                if logs[index]["id"] == last_seen_id:
+                    return logs[index + 1:]
+        
+        if last_seen_timestamp is not None and logs and _timestamp(logs[0]) <= last_seen_timestamp:
+            return [log for log in logs if _timestamp(log) > last_seen_timestamp]
+        
+        return None
+    
+    def newer_than(self, timestamp: datetime, exclude_ids: Set[str]) -> List[Dict]:
+        """Buffered logs at or after timestamp that are not in exclude_ids"""
+        with self._lock:
+            logs = list(self._logs)
+        return [log for log in logs if log["id"] not in exclude_ids and _timestamp(log) >= timestamp]
+
+
+def _apply_filter(query, log_filter: LogFilter):
+    """Translate a subscription filter into WHERE clauses"""
+    if log_filter.hospital_id is not None:
+        query = query.filter(AuditLog.hospital_id == log_filter.hospital_id)
+    if log_filter.patient_id is not None:
+        query = query.filter(AuditLog.patient_id == log_filter.patient_id)
+    if log_filter.event_types is not None:
+        query = query.filter(AuditLog.event_type.in_(sorted(log_filter.event_types)))
+    if log_filter.min_level is not None:
+        levels = [level for level, rank in LEVEL_RANK.items() if rank >= LEVEL_RANK[log_filter.min_level]]
+        query = query.filter(AuditLog.level.in_(levels))
+    return query
+
+
+def replay_from_database(
+    log_filter: LogFilter,
+    last_seen_id: Optional[str],
+    last_seen_timestamp: Optional[datetime],
+    limit: int
+) -> Optional[Tuple[List[Dict], int]]:
+    """
+    Missed logs from audit_logs, oldest first
+    
+    Uses a (timestamp, id) range on the timestamp index. At most the newest
+    `limit` logs are returned; the second value is how many older missed
+    logs were left out. Returns None when only last_seen_id was given and
+    that log is gone (retention, a dropped partition or cold storage), so
+    the position to replay from is unknown.
+    """
+    db = ReadSessionLocal()
+    try:
+        if last_seen_timestamp is None:
+            last_seen_timestamp = db.query(AuditLog.timestamp).filter(AuditLog.id == last_seen_id).scalar()
+            if last_seen_timestamp is None:
+                return None
+        
+        position = tuple_(AuditLog.timestamp, AuditLog.id) > tuple_(last_seen_timestamp, last_seen_id or "")
+        query = _apply_filter(db.query(AuditLog).filter(position), log_filter)
+        
+        rows = query.order_by(desc(AuditLog.timestamp), desc(AuditLog.id)).limit(limit + 1).all()
+        skipped = 0
+        if len(rows) > limit:
+            rows = rows[:limit]
+            skipped = _apply_filter(
+                db.query(func.count(AuditLog.id)).filter(position), log_filter
+            ).scalar() - limit
+        
+        return [serialize_log(row) for row in reversed(rows)], skipped
+    finally:
+        db.close()
+
+
+replay_buffer = ReplayBuffer(capacity=settings.LIVE_REPLAY_BUFFER)
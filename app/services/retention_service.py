@@ -0,0 +1,176 @@
+"""
+Retention and archival of old audit logs
+"""
+
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..database import SessionLocal
+from ..models import AuditLog
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+audit_logs = AuditLog.__table__
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return getattr(value, "value", str(value))
+
+
+class RetentionRule(NamedTuple):
+    """Logs matching `condition` expire `days` after their timestamp"""
+    name: str
+    days: int
+    condition: object
+
+
+class ArchiveWriter:
+    """
+    Appends expired logs to a gzip-compressed JSON Lines file
+    
+    Each run writes one file under archive_dir/YYYY/MM/. Every batch is
+    written as its own gzip member and flushed to disk before the caller
+    deletes the rows, so a crash can duplicate archived rows but never
+    lose them.
+    """
+    
+    def __init__(self, archive_dir: str, started_at: datetime):
+        directory = Path(archive_dir) / f"{started_at:%Y}" / f"{started_at:%m}"
+        self.path = directory / f"audit_logs_{started_at:%Y%m%dT%H%M%S}.jsonl.gz"
+        self.rows_written = 0
+    
+    def write(self, rows: List[Dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+                for row in rows:
+                    archive.write(json.dumps(row, default=_json_default).encode("utf-8") + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        self.rows_written += len(rows)
+
+
+class RetentionService:
+    """Deletes audit logs past their retention window in bounded batches"""
+    
+    @staticmethod
+    def rules(now: datetime) -> List[RetentionRule]:
+        """
+        Retention rules from settings, most specific first
+        
+        An event type window overrides the window of the log's level; the
+        default window covers levels without one. Unset windows keep logs
+        forever.
+        """
+        event_type_days = settings.RETENTION_EVENT_TYPE_DAYS
+        level_days = settings.RETENTION_LEVEL_DAYS
+        overridden = list(event_type_days)
+        
+        rules = []
+        for event_type, days in event_type_days.items():
+            rules.append(RetentionRule(
+                f"event_type={event_type}",
+                days,
+                and_(audit_logs.c.event_type == event_type, audit_logs.c.timestamp < now - timedelta(days=days))
+            ))
+        
+        for level, days in level_days.items():
+            rules.append(RetentionRule(
+                f"level={level}",
+                days,
+                and_(
+                    audit_logs.c.level == level,
+                    audit_logs.c.event_type.not_in(overridden),
+                    audit_logs.c.timestamp < now - timedelta(days=days)
+                )
+            ))
+        
+        if settings.RETENTION_DEFAULT_DAYS is not None:
+            rules.append(RetentionRule(
+                "default",
+                settings.RETENTION_DEFAULT_DAYS,
+                and_(
+                    audit_logs.c.level.not_in(list(level_days)),
+                    audit_logs.c.event_type.not_in(overridden),
+                    audit_logs.c.timestamp < now - timedelta(days=settings.RETENTION_DEFAULT_DAYS)
+                )
+            ))
+        return rules
+    
+    @staticmethod
+    def count_expired(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Expired logs per rule, without touching them"""
+        now = now or datetime.utcnow()
+        return {
+            rule.name: db.execute(select(func.count()).select_from(audit_logs).where(rule.condition)).scalar()
+            for rule in RetentionService.rules(now)
+        }
+    
+    @staticmethod
+    def purge_expired(
+        db: Session,
+        now: Optional[datetime] = None,
+        batch_size: Optional[int] = None,
+        archive: bool = True
+    ) -> Dict[str, int]:
+        """
+        Archive and delete expired logs; returns deleted rows per rule
+        
+        Rows are taken oldest first, batch_size at a time, and each batch is
+        committed on its own so no transaction holds locks for long. The
+        hourly rollup is left alone, so analytics keep covering purged
+        periods.
+        """
+        now = now or datetime.utcnow()
+        batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+        writer = ArchiveWriter(settings.RETENTION_ARCHIVE_DIR, now) if archive else None
+        
+        deleted = {}
+        for rule in RetentionService.rules(now):
+            deleted[rule.name] = 0
+            while True:
+                rows = db.execute(
+                    select(audit_logs).where(rule.condition).order_by(audit_logs.c.timestamp).limit(batch_size)
+                ).mappings().all()
+                if not rows:
+                    break
+                
+                if writer is not None:
+                    writer.write([dict(row) for row in rows])
+                db.execute(delete(audit_logs).where(audit_logs.c.id.in_([row["id"] for row in rows])))
+                db.commit()
+                
+                deleted[rule.name] += len(rows)
+                if len(rows) < batch_size:
+                    break
+                # Let the live generator in between batches
+                time.sleep(settings.RETENTION_BATCH_PAUSE)
+            
+            if deleted[rule.name]:
+                logger.info(f"Retention {rule.name} ({rule.days}d): deleted {deleted[rule.name]} logs")
+        
+        if writer is not None and writer.rows_written:
+            logger.info(f"Archived {writer.rows_written} logs to {writer.path}")
+        return deleted
+    
+    @staticmethod
+    def run():
+        """Scheduled job: purge expired logs with a fresh session"""
+        db = SessionLocal()
+        try:
+            RetentionService.purge_expired(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Retention run failed: {e}")
+        finally:
+            db.close()
@@ -0,0 +1,166 @@
+"""
+Hourly rollup maintenance for audit log analytics
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import event, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..config import settings
+from ..models import AuditLog, AuditHourlyRollup
+from ..utils.logging import get_logger
+from .cold_storage import cold_storage
+from .retention_service import RetentionService
+
+logger = get_logger(__name__)
+
+RollupKey = Tuple[str, datetime, str, str]
+
+
+def _value(field):
+    """Plain string value of an enum member or string"""
+    return getattr(field, "value", field)
+
+
+class RollupService:
+    """Keeps audit_hourly_rollup in step with audit_logs"""
+    
+    @staticmethod
+    def hour_bucket(timestamp: datetime) -> datetime:
+        """Truncate a timestamp to the start of its hour"""
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    
+    @staticmethod
+    def aggregate(logs: Iterable) -> Dict[RollupKey, int]:
+        """
+        Count logs per (hospital_id, hour, level, event_type)
+        
+        Accepts AuditLog objects, row tuples or plain dicts as produced by
+        EventGenerator.
+        """
+        counts = defaultdict(int)
+        for log in logs:
+            if isinstance(log, dict):
+                hospital_id, timestamp = log["hospital_id"], log["timestamp"]
+                level, event_type = log["level"], log["event_type"]
+            else:
+                hospital_id, timestamp = log.hospital_id, log.timestamp
+                level, event_type = log.level, log.event_type
+            
+            key = (hospital_id, RollupService.hour_bucket(timestamp), _value(level), _value(event_type))
+            counts[key] += 1
+        return counts
+    
+    @staticmethod
+    def apply(connection, counts: Dict[RollupKey, int]):
+        """Add counts to the rollup table with a dialect-native upsert"""
+        if not counts:
+            return
+        
+        table = AuditHourlyRollup.__table__
+        dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.hospital_id, table.c.hour, table.c.level, table.c.event_type],
+            set_={"count": table.c.count + stmt.excluded["count"]}
+        )
+        
+        connection.execute(stmt, [
+            {
+                "hospital_id": hospital_id,
+                "hour": hour,
+                "level": level,
+                "event_type": event_type,
+                "count": count,
+            }
+            for (hospital_id, hour, level, event_type), count in counts.items()
+        ])
+    
+    @staticmethod
+    def complete_since(db: Session, now: datetime) -> Optional[datetime]:
+        """
+        Start of the oldest hour whose raw logs are all still stored
+        
+        Retention deletes raw logs but keeps their rollup rows, so for older
+        hours the rollup is the only record left and must not be rebuilt.
+        None when neither audit_logs nor the cold tier holds any logs.
+        """
+        oldest = [db.query(func.min(AuditLog.timestamp)).scalar()]
+        if cold_storage.enabled:
+            oldest.append(cold_storage.oldest_timestamp())
+        oldest = [timestamp for timestamp in oldest if timestamp is not None]
+        if not oldest:
+            return None
+        
+        # Earlier rows in the oldest log's own hour may already be purged
+        first = min(oldest)
+        boundary = RollupService.hour_bucket(first)
+        if first > boundary:
+            boundary += timedelta(hours=1)
+        
+        # Per-level and per-event-type windows purge some rows well after the oldest log
+        if settings.RETENTION_ENABLED:
+            rules = RetentionService.rules(now)
+            if rules:
+                cutoff = now - timedelta(days=min(rule.days for rule in rules))
+                boundary = max(boundary, RollupService.hour_bucket(cutoff) + timedelta(hours=1))
+        return boundary
+    
+    @staticmethod
+    def backfill(db: Session, since: Optional[datetime] = None, batch_size: int = 10000) -> int:
+        """
+        Rebuild rollup rows from audit_logs and the cold storage tier
+        
+        Only complete hours are rebuilt (up to the start of the current hour),
+        so events being inserted by the live generator are not double counted.
+        Hours before complete_since() are left alone: their raw logs may have
+        been purged by retention. Returns the number of audit logs aggregated.
+        """
+        now = datetime.utcnow()
+        until = RollupService.hour_bucket(now)
+        start = RollupService.complete_since(db, now)
+        if start is None:
+            logger.info("No stored audit logs; rollup left unchanged")
+            return 0
+        since = max(RollupService.hour_bucket(since), start) if since else start
+        
+        delete_query = db.query(AuditHourlyRollup).filter(
+            AuditHourlyRollup.hour >= since, AuditHourlyRollup.hour < until
+        )
+        rows_query = db.query(
+            AuditLog.hospital_id, AuditLog.timestamp, AuditLog.level, AuditLog.event_type
+        ).filter(AuditLog.timestamp >= since, AuditLog.timestamp < until)
+        
+        deleted = delete_query.delete(synchronize_session=False)
+        logger.info(f"Removed {deleted} rollup rows from {since} on before backfill")
+        
+        counts = defaultdict(int)
+        total = 0
+        for row in rows_query.yield_per(batch_size):
+            key = (row.hospital_id, RollupService.hour_bucket(row.timestamp), _value(row.level), _value(row.event_type))
+            counts[key] += 1
+            total += 1
+            if total % (batch_size * 10) == 0:
+                logger.info(f"Aggregated {total} audit logs...")
+        
+        # Archived logs are no longer in audit_logs but still count
+        if cold_storage.enabled:
+            for key, count in cold_storage.hourly_counts(since, until).items():
+                counts[key] += count
+                total += count
+        
+        RollupService.apply(db.connection(), counts)
+        db.commit()
+        
+        logger.info(f"Backfilled {len(counts)} rollup rows from {total} audit logs")
+        return total
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_logs(session, flush_context):
+    """Increment the rollup for AuditLog rows inserted by an ORM flush"""
+    new_logs = [obj for obj in session.new if isinstance(obj, AuditLog)]
+    if new_logs:
+        RollupService.apply(session.connection(), RollupService.aggregate(new_logs))
@@ -0,0 +1,162 @@
+"""
+Entity search backed by the search_index table
+"""
+
+from typing import Dict, List, Optional, Tuple, Type
+from sqlalchemy import and_, case, column, delete, desc, event, func, inspect, select, table, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..models import Device, Patient, SearchIndexEntry, User
+from ..utils.logging import get_logger
+from ..utils.text_search import fold_search_text, like_pattern
+
+logger = get_logger(__name__)
+
+# entity_type -> (model, fields whose text is searchable)
+SEARCHABLE: Dict[str, Tuple[Type, Tuple[str, ...]]] = {
+    "user": (User, ("name", "department")),
+    "device": (Device, ("name", "ip_address")),
+    "patient": (Patient, ("id", "name")),
+}
+
+_ENTITY_TYPES = {model: entity_type for entity_type, (model, _) in SEARCHABLE.items()}
+
+# Shortest query the trigram indexes can serve; shorter ones fall back to LIKE
+MIN_TRIGRAM_LENGTH = 3
+
+search_index_fts = table("search_index_fts", column("rowid"), column("rank"))
+
+
+def match_rank(content: str, folded: str) -> Tuple[int, int]:
+    """
+    Sort key for a match: (position, length)
+    
+    position is 0 when content starts with the query, 1 for a word prefix
+    match and 2 otherwise; shorter documents win ties.
+    """
+    if content.startswith(folded):
+        position = 0
+    elif (" " + folded) in content:
+        position = 1
+    else:
+        position = 2
+    return position, len(content)
+
+
+class SearchService:
+    """Maintains search_index and runs ranked substring searches over it"""
+    
+    @staticmethod
+    def document(obj) -> Tuple[str, str, str]:
+        """(entity_type, entity_id, content) for a searchable object"""
+        entity_type = _ENTITY_TYPES[type(obj)]
+        _, fields = SEARCHABLE[entity_type]
+        content = fold_search_text(" | ".join(getattr(obj, field) or "" for field in fields))
+        return entity_type, obj.id, content
+    
+    @staticmethod
+    def upsert(connection, documents: List[Tuple[str, str, str]]):
+        """Insert or replace index entries with a dialect-native upsert"""
+        if not documents:
+            return
+        
+        entries = SearchIndexEntry.__table__
+        dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+        stmt = dialect_insert(entries)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[entries.c.entity_type, entries.c.entity_id],
+            set_={"content": stmt.excluded.content}
+        )
+        connection.execute(stmt, [
+            {"entity_type": entity_type, "entity_id": entity_id, "content": content}
+            for entity_type, entity_id, content in documents
+        ])
+    
+    @staticmethod
+    def rebuild(db: Session) -> int:
+        """Recreate every index entry from users, devices and patients"""
+        db.execute(delete(SearchIndexEntry))
+        total = 0
+        for model, fields in SEARCHABLE.values():
+            documents = [SearchService.document(obj) for obj in db.query(model)]
+            SearchService.upsert(db.connection(), documents)
+            total += len(documents)
+        db.commit()
+        logger.info(f"Indexed {total} entities for search")
+        return total
+    
+    @staticmethod
+    def ensure_built(db: Session):
+        """Build the index once for databases created before it existed"""
+        if db.query(SearchIndexEntry.id).first() is None:
+            SearchService.rebuild(db)
+    
+    @staticmethod
+    async def search(
+        db: AsyncSession,
+        entity_type: str,
+        q: str,
+        limit: int = 20,
+        status: Optional[str] = "active"
+    ) -> List:
+        """
+        Ranked case-, accent- and Turkish-insensitive substring search
+        
+        Results whose text starts with the query come first, then word
+        prefix matches, then other substrings; ties are broken by trigram
+        similarity on PostgreSQL and bm25 on SQLite.
+        """
+        model, _ = SEARCHABLE[entity_type]
+        folded = fold_search_text(q)
+        if not folded:
+            return []
+        
+        entry = SearchIndexEntry
+        rank = case(
+            (entry.content.like(like_pattern(folded, prefix=""), escape="/"), 0),
+            (entry.content.like(like_pattern(folded, prefix="% "), escape="/"), 1),
+            else_=2
+        )
+        query = select(model).join(
+            entry, and_(entry.entity_type == entity_type, entry.entity_id == model.id)
+        )
+        
+        dialect_name = db.get_bind().dialect.name
+        if dialect_name == "sqlite" and len(folded) >= MIN_TRIGRAM_LENGTH:
+            phrase = '"' + folded.replace('"', '""') + '"'
+            query = query.join(search_index_fts, search_index_fts.c.rowid == entry.id).where(
+                text("search_index_fts MATCH :phrase").bindparams(phrase=phrase)
+            ).order_by(rank, search_index_fts.c.rank)
+        else:
+            query = query.where(entry.content.like(like_pattern(folded), escape="/"))
+            if dialect_name == "postgresql":
+                query = query.order_by(rank, desc(func.similarity(entry.content, folded)))
+            else:
+                query = query.order_by(rank, func.length(entry.content))
+        
+        if status is not None:
+            query = query.where(model.status == status)
+        
+        return (await db.execute(query.limit(limit))).scalars().all()
+
+
+@event.listens_for(Session, "after_flush")
+def _index_flushed_entities(session, flush_context):
+    """Keep search_index in step with inserted, edited and deleted entities"""
+    documents = []
+    for obj in list(session.new) + list(session.dirty):
+        entity_type = _ENTITY_TYPES.get(type(obj))
+        if entity_type is None:
+            continue
+        state = inspect(obj)
+        _, fields = SEARCHABLE[entity_type]
+        if obj in session.new or any(state.attrs[field].history.has_changes() for field in fields):
+            documents.append(SearchService.document(obj))
+    SearchService.upsert(session.connection(), documents)
+    
+    removed = [(_ENTITY_TYPES[type(obj)], obj.id) for obj in session.deleted if type(obj) in _ENTITY_TYPES]
+    for entity_type, entity_id in removed:
+        session.connection().execute(delete(SearchIndexEntry).where(
+            SearchIndexEntry.entity_type == entity_type, SearchIndexEntry.entity_id == entity_id
+        ))
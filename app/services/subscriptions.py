@@ -0,0 +1,154 @@
+"""
+Filtered live log subscriptions for Socket.IO clients
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set
+from ..models.audit import EventType, LogLevel
+
+# Severity order used by min_level
+LEVEL_RANK = {
+    LogLevel.DEBUG.value: 0,
+    LogLevel.INFO.value: 1,
+    LogLevel.WARNING.value: 2,
+    LogLevel.ERROR.value: 3,
+    LogLevel.CRITICAL.value: 4,
+}
+
+
+class InvalidSubscriptionError(ValueError):
+    """Raised when subscribe_logs receives filters that cannot be applied"""
+
+
+class LogFilter(NamedTuple):
+    """Filters carried by a live log subscription; None matches everything"""
+    hospital_id: Optional[str] = None
+    min_level: Optional[str] = None
+    event_types: Optional[FrozenSet[str]] = None
+    patient_id: Optional[str] = None
+    
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "LogFilter":
+        """Build a filter from the subscribe_logs payload"""
+        data = data or {}
+        
+        hospital_id = data.get("hospital_id")
+        if hospital_id == "all":
+            hospital_id = None
+        
+        min_level = data.get("min_level")
+        if min_level is not None:
+            min_level = str(min_level).upper()
+            if min_level not in LEVEL_RANK:
+                raise InvalidSubscriptionError(f"Unknown level: {data.get('min_level')}")
+        
+        event_types = data.get("event_types")
+        if event_types:
+            if isinstance(event_types, str):
+                event_types = [event_types]
+            unknown = set(event_types) - set(EventType.__members__)
+            if unknown:
+                raise InvalidSubscriptionError(f"Unknown event types: {', '.join(sorted(unknown))}")
+            event_types = frozenset(event_types)
+        else:
+            event_types = None
+        
+        return cls(hospital_id, min_level, event_types, data.get("patient_id") or None)
+    
+    def matches(self, log: Dict) -> bool:
+        """Whether a serialized log passes every filter"""
+        if self.hospital_id is not None and log.get("hospital_id") != self.hospital_id:
+            return False
+        if self.patient_id is not None and log.get("patient_id") != self.patient_id:
+            return False
+        if self.event_types is not None and log.get("event_type") not in self.event_types:
+            return False
+        if self.min_level is not None and LEVEL_RANK.get(log.get("level"), 0) < LEVEL_RANK[self.min_level]:
+            return False
+        return True
+
+
+class SubscriptionRegistry:
+    """
+    Tracks which sids subscribed with which filter
+    
+    Subscribers with identical filters share one entry. Each distinct filter
+    is indexed under its most selective field (patient, then event type,
+    then hospital), so routing a log only inspects filters that can match
+    it rather than every connected client.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filters: Dict[str, LogFilter] = {}
+        self._sids_by_filter: Dict[LogFilter, Set[str]] = defaultdict(set)
+        self._by_patient: Dict[str, Set[LogFilter]] = defaultdict(set)
+        self._by_event_type: Dict[str, Set[LogFilter]] = defaultdict(set)
+        self._by_hospital: Dict[str, Set[LogFilter]] = defaultdict(set)
+        self._unindexed: Set[LogFilter] = set()
+    
+    def __len__(self) -> int:
+        return len(self._filters)
+    
+    def _index_sets(self, log_filter: LogFilter) -> List[Set[LogFilter]]:
+        """Index buckets a filter is stored in"""
+        if log_filter.patient_id is not None:
+            return [self._by_patient[log_filter.patient_id]]
+        if log_filter.event_types is not None:
+            return [self._by_event_type[event_type] for event_type in log_filter.event_types]
+        if log_filter.hospital_id is not None:
+            return [self._by_hospital[log_filter.hospital_id]]
+        return [self._unindexed]
+    
+    def subscribe(self, sid: str, log_filter: LogFilter):
+        """Register sid with a filter, replacing any previous subscription"""
+        with self._lock:
+            self._remove(sid)
+            self._filters[sid] = log_filter
+            sids = self._sids_by_filter[log_filter]
+            if not sids:
+                for index in self._index_sets(log_filter):
+                    index.add(log_filter)
+            sids.add(sid)
+    
+    def unsubscribe(self, sid: str) -> Optional[LogFilter]:
+        """Drop sid's subscription; returns the filter it had"""
+        with self._lock:
+            return self._remove(sid)
+    
+    def _remove(self, sid: str) -> Optional[LogFilter]:
+        log_filter = self._filters.pop(sid, None)
+        if log_filter is None:
+            return None
+        
+        sids = self._sids_by_filter[log_filter]
+        sids.discard(sid)
+        if not sids:
+            del self._sids_by_filter[log_filter]
+            for index in self._index_sets(log_filter):
+                index.discard(log_filter)
+        return log_filter
+    
+    def matching_filters(self, log: Dict) -> Set[LogFilter]:
+        """Distinct filters with at least one subscriber that match a log"""
+        with self._lock:
+            candidates = set(self._unindexed)
+            candidates.update(self._by_hospital.get(log.get("hospital_id"), ()))
+            candidates.update(self._by_event_type.get(log.get("event_type"), ()))
+            candidates.update(self._by_patient.get(log.get("patient_id"), ()))
+        return {log_filter for log_filter in candidates if log_filter.matches(log)}
+    
+    def route(self, logs: List[Dict]) -> Dict[str, List[Dict]]:
+        """Group a batch of logs by the sids that should receive them"""
+        by_sid = defaultdict(list)
+        for log in logs:
+            for log_filter in self.matching_filters(log):
+                with self._lock:
+                    sids = list(self._sids_by_filter.get(log_filter, ()))
+                for sid in sids:
+                    by_sid[sid].append(log)
+        return by_sid
+
+
+subscriptions = SubscriptionRegistry()
@@ -0,0 +1,246 @@
+"""
+In-process typeahead index over users, devices and patients
+"""
+
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import chain
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..database import SessionLocal
+from ..schemas import DeviceResponse, PatientResponse, UserResponse
+from ..utils.logging import get_logger
+from ..utils.text_search import fold_search_text
+from .search_service import SEARCHABLE, SearchService, match_rank
+
+logger = get_logger(__name__)
+
+RESPONSE_SCHEMAS = {"user": UserResponse, "device": DeviceResponse, "patient": PatientResponse}
+
+
+def _ngrams(text: str, size: int) -> Set[str]:
+    return {text[index:index + size] for index in range(len(text) - size + 1)}
+
+
+def _trigrams(text: str) -> Set[str]:
+    return _ngrams(text, 3)
+
+
+def _status(obj) -> Optional[str]:
+    return getattr(obj.status, "value", obj.status)
+
+
+class IndexedEntity(NamedTuple):
+    """One searchable entity: folded text, status and the API payload"""
+    content: str
+    status: Optional[str]
+    payload: Dict
+
+
+class _EntityIndex:
+    """
+    Prefix, bigram and trigram postings for one entity type
+    
+    Word prefixes are looked up by bisecting a sorted token list (a flat
+    trie), substrings by intersecting trigram posting sets and checking
+    the candidates. Two-character substrings come straight from the bigram
+    postings and single characters from a scan.
+    """
+    
+    def __init__(self):
+        self.entities: Dict[str, IndexedEntity] = {}
+        self.bigrams: Dict[str, Set[str]] = defaultdict(set)
+        self.trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self.token_ids: Dict[str, Set[str]] = defaultdict(set)
+        self.tokens: List[str] = []
+        self._tokens_dirty = False
+    
+    def add(self, entity_id: str, entity: IndexedEntity):
+        self.remove(entity_id)
+        self.entities[entity_id] = entity
+        for bigram in _ngrams(entity.content, 2):
+            self.bigrams[bigram].add(entity_id)
+        for trigram in _trigrams(entity.content):
+            self.trigrams[trigram].add(entity_id)
+        for token in entity.content.split():
+            if not self.token_ids[token]:
+                self._tokens_dirty = True
+            self.token_ids[token].add(entity_id)
+    
+    def remove(self, entity_id: str):
+        entity = self.entities.pop(entity_id, None)
+        if entity is None:
+            return
+        for bigram in _ngrams(entity.content, 2):
+            self.bigrams[bigram].discard(entity_id)
+        for trigram in _trigrams(entity.content):
+            self.trigrams[trigram].discard(entity_id)
+        for token in entity.content.split():
+            ids = self.token_ids[token]
+            ids.discard(entity_id)
+            if not ids:
+                del self.token_ids[token]
+                self._tokens_dirty = True
+    
+    def _prefix_matches(self, prefix: str) -> Set[str]:
+        if self._tokens_dirty:
+            self.tokens = sorted(self.token_ids)
+            self._tokens_dirty = False
+        
+        ids = set()
+        index = bisect_left(self.tokens, prefix)
+        while index < len(self.tokens) and self.tokens[index].startswith(prefix):
+            ids |= self.token_ids[self.tokens[index]]
+            index += 1
+        return ids
+    
+    def _substring_matches(self, folded: str) -> Set[str]:
+        if len(folded) == 1:
+            return {entity_id for entity_id, entity in self.entities.items() if folded in entity.content}
+        if len(folded) == 2:
+            return set(self.bigrams.get(folded, ()))
+        postings = sorted((self.trigrams.get(trigram, set()) for trigram in _trigrams(folded)), key=len)
+        if not postings or not postings[0]:
+            return set()
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return candidates
+        return {entity_id for entity_id in candidates if folded in self.entities[entity_id].content}
+    
+    def _ranked(self, ids: Set[str], folded: str, limit: int, status: Optional[str]) -> List[Tuple[Tuple[int, int], Dict]]:
+        ranked = (
+            (match_rank(self.entities[entity_id].content, folded), entity_id)
+            for entity_id in ids
+            if status is None or self.entities[entity_id].status == status
+        )
+        return [(rank, self.entities[entity_id].payload) for rank, entity_id in heapq.nsmallest(limit, ranked)]
+    
+    def search(self, folded: str, limit: int, status: Optional[str]) -> List[Tuple[Tuple[int, int], Dict]]:
+        if len(folded) < 3:
+            # Word prefix matches rank before any other substring, so a
+            # full page of them is already the substring search's answer
+            results = self._ranked(self._prefix_matches(folded), folded, limit, status)
+            if len(results) >= limit:
+                return results
+        return self._ranked(self._substring_matches(folded), folded, limit, status)
+
+
+class TypeaheadIndex:
+    """
+    Users, devices and patients held in memory for /api/search
+    
+    Loaded at startup and updated from committed ORM changes, so lookups
+    never touch the database. Each worker process keeps its own copy;
+    refresh() reloads it to pick up writes made by other processes.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, _EntityIndex] = {entity_type: _EntityIndex() for entity_type in SEARCHABLE}
+        self.loaded_at: Optional[float] = None
+    
+    @staticmethod
+    def entry(obj) -> Tuple[str, str, IndexedEntity]:
+        """(entity_type, entity_id, IndexedEntity) for a searchable object"""
+        entity_type, entity_id, content = SearchService.document(obj)
+        payload = RESPONSE_SCHEMAS[entity_type].model_validate(obj).model_dump(mode="json")
+        return entity_type, entity_id, IndexedEntity(content, _status(obj), payload)
+    
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+    
+    def load(self, db: Session):
+        """Replace the index contents with the current database state"""
+        started = time.perf_counter()
+        indexes = {entity_type: _EntityIndex() for entity_type in SEARCHABLE}
+        total = 0
+        for model, _ in SEARCHABLE.values():
+            for obj in db.query(model):
+                entity_type, entity_id, entity = TypeaheadIndex.entry(obj)
+                indexes[entity_type].add(entity_id, entity)
+                total += 1
+        
+        with self._lock:
+            self._indexes = indexes
+            self.loaded_at = time.time()
+        logger.info(f"Typeahead index loaded {total} entities in {time.perf_counter() - started:.2f}s")
+    
+    def refresh(self):
+        """Scheduled job: reload from a fresh session"""
+        db = SessionLocal()
+        try:
+            self.load(db)
+        except Exception as e:
+            logger.error(f"Typeahead index refresh failed: {e}")
+        finally:
+            db.close()
+    
+    def apply(self, changes: List[Tuple[str, str, Optional[IndexedEntity]]]):
+        """Apply committed changes; a None entity removes the entry"""
+        with self._lock:
+            for entity_type, entity_id, entity in changes:
+                if entity is None:
+                    self._indexes[entity_type].remove(entity_id)
+                else:
+                    self._indexes[entity_type].add(entity_id, entity)
+    
+    def search_ranked(
+        self,
+        entity_type: str,
+        q: str,
+        limit: int = 20,
+        status: Optional[str] = "active"
+    ) -> List[Tuple[Tuple[int, int], Dict]]:
+        """
+        (match_rank, payload) pairs for q, best first
+        
+        Matches substrings, like SearchService.search. Queries shorter
+        than three characters are answered from word prefixes when those
+        fill the page.
+        """
+        folded = fold_search_text(q)
+        if not folded:
+            return []
+        with self._lock:
+            return self._indexes[entity_type].search(folded, limit, status)
+    
+    def search(self, entity_type: str, q: str, limit: int = 20, status: Optional[str] = "active") -> List[Dict]:
+        """Ranked payloads for q, ordered like SearchService.search"""
+        return [payload for _, payload in self.search_ranked(entity_type, q, limit, status)]
+
+
+typeahead_index = TypeaheadIndex()
+
+_SEARCHABLE_MODELS = tuple(model for model, _ in SEARCHABLE.values())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_typeahead_changes(session, flush_context):
+    """Snapshot flushed entities; they are applied only if the transaction commits"""
+    changes = session.info.setdefault("typeahead_changes", [])
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, _SEARCHABLE_MODELS):
+            changes.append(TypeaheadIndex.entry(obj))
+    for obj in session.deleted:
+        if isinstance(obj, _SEARCHABLE_MODELS):
+            entity_type, entity_id, _ = SearchService.document(obj)
+            changes.append((entity_type, entity_id, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_typeahead_changes(session):
+    changes = session.info.pop("typeahead_changes", None)
+    if changes and typeahead_index.loaded:
+        typeahead_index.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_typeahead_changes(session):
+    session.info.pop("typeahead_changes", None)
@@ -3,6 +3,11 @@ Utility functions
 """
 
 from .logging import setup_logging, get_logger
+from .pagination import encode_cursor, decode_cursor, InvalidCursorError
+from .time_buckets import BUCKET_SIZES, bucket_expression, fill_buckets
+from .text_search import fold_search_text, turkish_lower
 
-__all__ = ["setup_logging", "get_logger"]
-
+__all__ = [
+    "setup_logging", "get_logger", "encode_cursor", "decode_cursor", "InvalidCursorError",
+    "BUCKET_SIZES", "bucket_expression", "fill_buckets", "fold_search_text", "turkish_lower",
+]
@@ -0,0 +1,137 @@
+"""
+Connection pool instrumentation
+"""
+
+import threading
+import time
+from typing import Dict, Iterator, List
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily, Metric
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+CHECKOUT_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+class PoolMetrics:
+    """Checkout counters and wait-time histogram for one pool"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.bucket_counts = [0] * (len(CHECKOUT_BUCKETS) + 1)
+    
+    def observe(self, seconds: float, timed_out: bool = False):
+        """Record one checkout attempt that waited `seconds`"""
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            for index, bound in enumerate(CHECKOUT_BUCKETS):
+                if seconds <= bound:
+                    self.bucket_counts[index] += 1
+                    break
+            else:
+                self.bucket_counts[-1] += 1
+    
+    def snapshot(self, pool) -> Dict:
+        """Current pool state plus the recorded counters"""
+        with self._lock:
+            cumulative = 0
+            histogram = []
+            for bound, count in zip(CHECKOUT_BUCKETS + ["+Inf"], self.bucket_counts):
+                cumulative += count
+                histogram.append({"le": bound, "count": cumulative})
+            
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_histogram": histogram,
+            }
+
+
+class _InstrumentedPoolMixin:
+    """Times how long callers wait for a connection from the pool"""
+    
+    metrics: PoolMetrics
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.observe(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.observe(time.perf_counter() - started)
+        return connection
+    
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """QueuePool that records checkout wait times"""
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait times"""
+
+
+_registry: List = []
+
+
+def register_engine(name: str, engine):
+    """Attach a PoolMetrics to an engine built with an instrumented pool"""
+    pool = engine.pool
+    pool.metrics = PoolMetrics(name)
+    _registry.append(engine)
+
+
+def pool_stats() -> Dict[str, Dict]:
+    """Snapshot of every registered pool, keyed by engine name"""
+    return {engine.pool.metrics.name: engine.pool.metrics.snapshot(engine.pool) for engine in _registry}
+
+
+class PoolCollector:
+    """Prometheus collector exposing pool_stats() at scrape time"""
+    
+    def collect(self) -> Iterator[Metric]:
+        gauges = {
+            "pool_size": GaugeMetricFamily("db_pool_size", "Configured pool size", labels=["pool"]),
+            "checked_out": GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["pool"]),
+            "checked_in": GaugeMetricFamily("db_pool_checked_in", "Idle connections in the pool", labels=["pool"]),
+            "overflow": GaugeMetricFamily("db_pool_overflow", "Connections open beyond pool_size", labels=["pool"]),
+        }
+        checkouts = CounterMetricFamily("db_pool_checkouts", "Successful connection checkouts", labels=["pool"])
+        timeouts = CounterMetricFamily("db_pool_checkout_timeouts", "Checkouts that hit pool_timeout", labels=["pool"])
+        wait = HistogramMetricFamily(
+            "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", labels=["pool"]
+        )
+        
+        for name, stats in pool_stats().items():
+            for key, gauge in gauges.items():
+                gauge.add_metric([name], stats[key])
+            checkouts.add_metric([name], stats["checkouts"])
+            timeouts.add_metric([name], stats["timeouts"])
+            buckets = [(str(bucket["le"]), bucket["count"]) for bucket in stats["wait_seconds_histogram"]]
+            wait.add_metric([name], buckets, sum_value=stats["wait_seconds_total"])
+        
+        yield from gauges.values()
+        yield checkouts
+        yield timeouts
+        yield wait
@@ -0,0 +1,36 @@
+"""
+Text normalisation for search
+"""
+
+import unicodedata
+
+# Turkish dotted/dotless I pairs that str.lower() gets wrong
+_TURKISH_UPPER = str.maketrans({"İ": "i", "I": "ı"})
+
+# Letters without a Unicode decomposition to a base letter
+_BASE_LETTERS = str.maketrans({"ı": "i", "ß": "ss", "æ": "ae", "ø": "o"})
+
+
+def turkish_lower(text: str) -> str:
+    """Lowercase with Turkish rules (İ -> i, I -> ı)"""
+    return unicodedata.normalize("NFC", text).translate(_TURKISH_UPPER).lower()
+
+
+def fold_search_text(text: str) -> str:
+    """
+    Case- and accent-insensitive form used by the search index
+    
+    Turkish lowercasing first, then diacritics are dropped, so "IŞIK",
+    "ışık" and "isik" all fold to "isik" and "İstanbul" to "istanbul".
+    Whitespace is collapsed to single spaces.
+    """
+    decomposed = unicodedata.normalize("NFKD", turkish_lower(text).translate(_BASE_LETTERS))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.split())
+
+
+def like_pattern(text: str, prefix: str = "%", suffix: str = "%", escape: str = "/") -> str:
+    """LIKE pattern matching text literally, for use with ESCAPE `escape`"""
+    for char in (escape, "%", "_"):
+        text = text.replace(char, escape + char)
+    return f"{prefix}{text}{suffix}"
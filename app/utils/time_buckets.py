@@ -0,0 +1,99 @@
+"""
+Dialect-aware time bucketing for analytics queries
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Integer, cast, extract, func, literal_column
+
+# Supported bucket sizes in seconds
+BUCKET_SIZES = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+# date_trunc units on PostgreSQL for sizes that match a calendar field
+_DATE_TRUNC_UNITS = {
+    "1m": "minute",
+    "1h": "hour",
+    "1d": "day",
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def epoch_bucket_expression(column, seconds: int, dialect_name: str, origin: Optional[datetime] = None):
+    """
+    Integer epoch seconds of the bucket containing column
+    
+    Works for any bucket width. Buckets are multiples of `seconds` since the
+    epoch, or since `origin` (a whole second, at or before every value of
+    column) when given. On SQLite this is plain integer arithmetic on
+    strftime('%s'); on PostgreSQL it uses extract(epoch), which treats a
+    timestamp without time zone as UTC.
+    """
+    width = literal_column(str(seconds))
+    if dialect_name == "postgresql":
+        epoch = extract("epoch", column)
+    else:
+        epoch = cast(func.strftime(literal_column("'%s'"), column), Integer)
+    if origin is not None:
+        offset = literal_column(str(int((origin - EPOCH).total_seconds())))
+        epoch = (epoch - offset).self_group()
+    
+    if dialect_name == "postgresql":
+        bucket = func.floor(epoch / width) * width
+    else:
+        bucket = epoch.op("/")(width) * width
+    return bucket if origin is None else bucket + offset
+
+
+def bucket_expression(column, bucket: str, dialect_name: str):
+    """
+    Bucket start for column at one of the BUCKET_SIZES
+    
+    PostgreSQL gets native date_trunc (5m adds whole 5-minute steps to the
+    truncated hour); other dialects get the integer epoch bucket. Constants
+    are rendered inline so the expression can match an expression index.
+    """
+    if dialect_name == "postgresql":
+        if bucket in _DATE_TRUNC_UNITS:
+            return func.date_trunc(literal_column(f"'{_DATE_TRUNC_UNITS[bucket]}'"), column)
+        
+        minutes = literal_column(str(BUCKET_SIZES[bucket] // 60))
+        return func.date_trunc(literal_column("'hour'"), column) + (
+            func.floor(extract("minute", column) / minutes) * minutes * literal_column("interval '1 minute'")
+        )
+    
+    return epoch_bucket_expression(column, BUCKET_SIZES[bucket], dialect_name)
+
+
+def to_datetime(value) -> datetime:
+    """Normalize a bucket value (epoch seconds or timestamp) to a naive UTC datetime"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return EPOCH + timedelta(seconds=int(value))
+
+
+def floor_datetime(timestamp: datetime, seconds: int) -> datetime:
+    """Round a naive UTC datetime down to a multiple of `seconds` since the epoch"""
+    offset = int((timestamp - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=offset - offset % seconds)
+
+
+def fill_buckets(
+    counts: Dict[datetime, int],
+    start: datetime,
+    end: datetime,
+    seconds: int
+) -> List[Tuple[datetime, int]]:
+    """Return every bucket from start to end (inclusive), zero where counts has none"""
+    step = timedelta(seconds=seconds)
+    current = floor_datetime(start, seconds)
+    series = []
+    while current <= end:
+        series.append((current, counts.get(current, 0)))
+        current += step
+    return series
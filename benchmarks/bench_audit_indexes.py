@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the audit_logs index set
+
+Loads the same synthetic audit logs twice, once with the legacy
+single-column indexes and once with the composite indexes from
+app.migrations, and reports insert throughput and read latency of the hot
+query shapes for each. A last run without the audit_logs_fts triggers
+shows how much of the insert cost is the message full-text index.
+
+Usage:
+    python benchmarks/bench_audit_indexes.py --rows 200000 --repeat 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Point the app at a throwaway SQLite database before it is imported
+_tmp_dir = tempfile.mkdtemp(prefix="bench_indexes_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import delete, desc, func, insert, text, tuple_  # noqa: E402
+
+from app.database import engine, init_db, SessionLocal  # noqa: E402
+from app.data_seeder import seed_hospitals, seed_users, seed_devices, seed_patients  # noqa: E402
+from app.generators import EventGenerator  # noqa: E402
+from app.migrations import (  # noqa: E402
+    LEGACY_AUDIT_LOG_INDEXES, create_legacy_audit_log_indexes, migrate_audit_log_indexes
+)
+from app.models import AuditLog  # noqa: E402
+from app.services.entity_snapshot import load_entity_dicts  # noqa: E402
+
+BATCH_SIZE = 5000
+
+
+def generate_rows(rows: int):
+    """Synthetic audit logs spread over the last 30 days"""
+    init_db()
+    db = SessionLocal()
+    try:
+        seed_hospitals(db)
+        seed_users(db)
+        seed_devices(db)
+        seed_patients(db)
+        entities = load_entity_dicts(db)
+    finally:
+        db.close()
+    
+    now = datetime.utcnow()
+    generated = []
+    for _ in range(rows):
+        row = EventGenerator.generate_random_event(
+            entities["users"], entities["patients"], entities["devices"], entities["hospitals"]
+        )
+        row["timestamp"] = now - timedelta(seconds=random.randint(0, 30 * 24 * 3600))
+        generated.append(row)
+    return generated
+
+
+def load(rows) -> float:
+    """Replace audit_logs contents with rows; returns rows per second"""
+    with engine.begin() as connection:
+        connection.execute(delete(AuditLog))
+    
+    start = time.perf_counter()
+    for offset in range(0, len(rows), BATCH_SIZE):
+        with engine.begin() as connection:
+            connection.execute(insert(AuditLog), rows[offset:offset + BATCH_SIZE])
+    elapsed = time.perf_counter() - start
+    
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+    return len(rows) / elapsed
+
+
+def hot_queries(hospital_id: str):
+    """(label, query builder) for the query shapes the API runs"""
+    day_ago = datetime.utcnow() - timedelta(days=1)
+    newest_first = (desc(AuditLog.timestamp), desc(AuditLog.id))
+    
+    def logs_by_hospital(db):
+        return db.query(AuditLog).filter(AuditLog.hospital_id == hospital_id) \
+            .order_by(*newest_first).limit(1000).all()
+    
+    def logs_by_level(db):
+        return db.query(AuditLog).filter(AuditLog.level == "ERROR") \
+            .order_by(*newest_first).limit(100).all()
+    
+    def logs_by_event_type(db):
+        return db.query(AuditLog).filter(AuditLog.event_type == "PATIENT_ACCESS") \
+            .order_by(*newest_first).limit(100).all()
+    
+    def keyset_page(db, *conditions):
+        first = db.query(AuditLog.timestamp, AuditLog.id).filter(*conditions) \
+            .order_by(*newest_first).offset(500).first()
+        return db.query(AuditLog).filter(
+            *conditions, tuple_(AuditLog.timestamp, AuditLog.id) < tuple_(first.timestamp, first.id)
+        ).order_by(*newest_first).limit(100).all()
+    
+    def last_day_count(db):
+        return db.query(func.count(AuditLog.id)).filter(
+            AuditLog.hospital_id == hospital_id, AuditLog.timestamp >= day_ago
+        ).scalar()
+    
+    return [
+        ("logs by hospital", logs_by_hospital),
+        ("logs by level", logs_by_level),
+        ("logs by event type", logs_by_event_type),
+        ("keyset page", keyset_page),
+        ("hospital keyset page", lambda db: keyset_page(db, AuditLog.hospital_id == hospital_id)),
+        ("last day count", last_day_count),
+    ]
+
+
+def measure(label: str, rows, repeat: int, hospital_id: str):
+    """Load rows under the current index set and time the hot queries"""
+    throughput = load(rows)
+    
+    with engine.connect() as connection:
+        index_count = connection.execute(text(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = 'audit_logs'"
+        )).scalar()
+    
+    print(f"\n{label}: {index_count} indexes, insert throughput {throughput:,.0f} rows/s")
+    
+    db = SessionLocal()
+    try:
+        for name, query in hot_queries(hospital_id):
+            query(db)  # warm up
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                query(db)
+                timings.append((time.perf_counter() - start) * 1000)
+                db.expunge_all()
+            
+            timings.sort()
+            print(
+                f"  {name:<22} median: {timings[len(timings) // 2]:.2f} ms  "
+                f"p95: {timings[int(len(timings) * 0.95) - 1]:.2f} ms"
+            )
+    finally:
+        db.close()
+
+
+def drop_current_indexes():
+    """Drop the composite indexes declared on AuditLog"""
+    with engine.begin() as connection:
+        for index in AuditLog.__table__.indexes:
+            index.drop(connection, checkfirst=True)
+
+
+def drop_fts_triggers():
+    """Stop maintaining audit_logs_fts on writes"""
+    with engine.begin() as connection:
+        for trigger in ("audit_logs_fts_ai", "audit_logs_fts_ad", "audit_logs_fts_au"):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="audit log rows to generate")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per query")
+    args = parser.parse_args()
+    
+    print(f"Generating {args.rows} audit logs in {_tmp_dir} ...")
+    rows = generate_rows(args.rows)
+    hospital_id = rows[0]["hospital_id"]
+    
+    drop_current_indexes()
+    create_legacy_audit_log_indexes(engine)
+    measure(f"before ({len(LEGACY_AUDIT_LOG_INDEXES)} single-column)", rows, args.repeat, hospital_id)
+    
+    migrate_audit_log_indexes(engine)
+    measure("after (composite)", rows, args.repeat, hospital_id)
+    
+    drop_fts_triggers()
+    measure("after (composite, no FTS triggers)", rows, args.repeat, hospital_id)
+
+
+if __name__ == "__main__":
+    main()
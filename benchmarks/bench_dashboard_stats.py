@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark for /api/stats/dashboard
+
+Compares the original seven-query implementation with the single-statement
+conditional aggregation and reports round trips and latency per request.
+
+Usage:
+    python benchmarks/bench_dashboard_stats.py --rows 200000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Point the app at a throwaway SQLite database before it is imported
+_tmp_dir = tempfile.mkdtemp(prefix="bench_dashboard_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from app.database import async_engine, engine, init_db, AsyncSessionLocal, SessionLocal  # noqa: E402
+from app.data_seeder import seed_hospitals, seed_users, seed_devices, seed_patients  # noqa: E402
+from app.generators import EventGenerator  # noqa: E402
+from app.models import AuditLog, Hospital, User, Device, Patient  # noqa: E402
+from app.routers.logs import get_dashboard_stats  # noqa: E402
+
+
+def legacy_dashboard_stats(db, hospital_id=None):
+    """Original implementation: one COUNT query per counter"""
+    query = db.query(AuditLog)
+    if hospital_id and hospital_id != "all":
+        query = query.filter(AuditLog.hospital_id == hospital_id)
+    
+    total_events = query.count()
+    db.query(User).filter(User.status == "active").count()
+    db.query(Device).filter(Device.status == "active").count()
+    db.query(Patient).filter(Patient.status == "active").count()
+    query.filter(
+        (AuditLog.level.in_(["ERROR", "CRITICAL"])) |
+        (AuditLog.event_type.like("%SECURITY%"))
+    ).count()
+    query.filter(AuditLog.timestamp >= datetime.utcnow() - timedelta(hours=1)).count()
+    query.filter(AuditLog.level == "INFO").count()
+    return total_events
+
+
+# The router runs on AsyncSession; keep one loop so pooled connections stay valid
+_loop = asyncio.new_event_loop()
+
+
+def current_dashboard_stats(db):
+    """Current implementation, called the way the router is"""
+    async def run():
+        async with AsyncSessionLocal() as async_db:
+            return await get_dashboard_stats(hospital_id=None, db=async_db)
+    return _loop.run_until_complete(run())
+
+
+def populate(rows: int):
+    """Create entities and `rows` synthetic audit logs"""
+    init_db()
+    db = SessionLocal()
+    try:
+        seed_hospitals(db)
+        seed_users(db)
+        seed_devices(db)
+        seed_patients(db)
+        
+        hospitals = [{"id": h.id, "name": h.name} for h in db.query(Hospital).all()]
+        users = [{"id": u.id, "name": u.name} for u in db.query(User).all()]
+        devices = [{"id": d.id, "name": d.name, "type": d.type} for d in db.query(Device).all()]
+        patients = [{"id": p.id, "name": p.name} for p in db.query(Patient).all()]
+        
+        batch = []
+        for _ in range(rows):
+            batch.append(EventGenerator.generate_random_event(users, patients, devices, hospitals))
+            if len(batch) == 5000:
+                db.execute(insert(AuditLog), batch)
+                batch = []
+        if batch:
+            db.execute(insert(AuditLog), batch)
+        db.commit()
+    finally:
+        db.close()
+
+
+def measure(label: str, func, repeat: int):
+    """Run func `repeat` times and print latency and statement counts"""
+    statements = []
+    
+    def count_statement(*args):
+        statements.append(1)
+    
+    event.listen(engine, "before_cursor_execute", count_statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count_statement)
+    try:
+        db = SessionLocal()
+        try:
+            func(db)  # warm up
+            statements.clear()
+            
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func(db)
+                timings.append((time.perf_counter() - start) * 1000)
+        finally:
+            db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count_statement)
+    
+    timings.sort()
+    print(
+        f"{label:<12} round trips/request: {len(statements) / repeat:.0f}  "
+        f"median: {timings[len(timings) // 2]:.2f} ms  "
+        f"p95: {timings[int(len(timings) * 0.95) - 1]:.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="audit log rows to generate")
+    parser.add_argument("--repeat", type=int, default=20, help="requests per implementation")
+    args = parser.parse_args()
+    
+    print(f"Populating {args.rows} audit logs in {_tmp_dir} ...")
+    populate(args.rows)
+    
+    measure("before", legacy_dashboard_stats, args.repeat)
+    measure("after", current_dashboard_stats, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
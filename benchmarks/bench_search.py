@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark for /api/search/patients
+
+Compares the original ILIKE query, the search_index table (FTS5 on
+SQLite) and the in-memory typeahead index on the same patient set and
+reports latency per query.
+
+Usage:
+    python benchmarks/bench_search.py --patients 100000 --repeat 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the app at a throwaway SQLite database before it is imported
+_tmp_dir = tempfile.mkdtemp(prefix="bench_search_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.database import engine, init_db, AsyncSessionLocal, SessionLocal  # noqa: E402
+from app.data_seeder import seed_hospitals  # noqa: E402
+from app.generators import PatientGenerator  # noqa: E402
+from app.models import Patient  # noqa: E402
+from app.services.search_service import SearchService  # noqa: E402
+from app.services.typeahead import typeahead_index  # noqa: E402
+
+BATCH_SIZE = 5000
+
+# The router runs on AsyncSession; keep one loop so pooled connections stay valid
+_loop = asyncio.new_event_loop()
+
+
+def populate(count: int):
+    """Insert `count` generated patients and build both search indexes"""
+    init_db()
+    db = SessionLocal()
+    try:
+        seed_hospitals(db)
+    finally:
+        db.close()
+    
+    seen_ids, seen_tc = set(), set()
+    rows = []
+    while len(rows) < count:
+        patient = PatientGenerator.generate_patient(f"hospital-{random.randint(1, 5)}")
+        if patient["id"] in seen_ids or patient["tc_no"] in seen_tc:
+            continue
+        seen_ids.add(patient["id"])
+        seen_tc.add(patient["tc_no"])
+        rows.append(patient)
+    
+    for offset in range(0, len(rows), BATCH_SIZE):
+        with engine.begin() as connection:
+            connection.execute(insert(Patient), rows[offset:offset + BATCH_SIZE])
+    
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        SearchService.rebuild(db)
+        print(f"search_index built in {time.perf_counter() - started:.2f}s")
+        started = time.perf_counter()
+        typeahead_index.load(db)
+        print(f"typeahead index loaded in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+    return rows
+
+
+def ilike_search(db, q: str):
+    """Original implementation: leading-wildcard ILIKE on id and name"""
+    return db.execute(select(Patient).where(
+        (Patient.id.ilike(f"%{q}%")) |
+        (Patient.name.ilike(f"%{q}%"))
+    ).where(
+        Patient.status == "active"
+    ).limit(20)).scalars().all()
+
+
+def index_search(q: str):
+    """search_index table, called the way the router is"""
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await SearchService.search(db, "patient", q)
+    return _loop.run_until_complete(run())
+
+
+def time_calls(call, repeat: int):
+    call()  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        timings.append((time.perf_counter() - start) * 1_000_000)
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.95) - 1], len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=100000, help="patients to generate")
+    parser.add_argument("--repeat", type=int, default=50, help="runs per query")
+    args = parser.parse_args()
+    
+    print(f"Generating {args.patients} patients in {_tmp_dir} ...")
+    rows = populate(args.patients)
+    
+    sample = random.choice(rows)
+    first_name, last_name = sample["name"].split()[0], sample["name"].split()[-1]
+    queries = [first_name[:2], first_name, last_name.upper(), sample["name"], sample["id"][-6:], "qxzq"]
+    
+    db = SessionLocal()
+    try:
+        print(f"\n{'query':<28}{'backend':<12}{'median':>12}{'p95':>12}{'hits':>6}")
+        for q in queries:
+            for backend, call in (
+                ("ilike", lambda: ilike_search(db, q)),
+                ("index", lambda: index_search(q)),
+                ("memory", lambda: typeahead_index.search("patient", q)),
+            ):
+                median, p95, hits = time_calls(call, args.repeat)
+                print(f"{q!r:<28}{backend:<12}{median:>10.0f}us{p95:>10.0f}us{hits:>6}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Timeline downsampling stays within max_points
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Point the app at a throwaway SQLite database before it is imported
+_tmp_dir = tempfile.mkdtemp(prefix="test_timeline_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/test.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import delete, insert  # noqa: E402
+
+from app.database import AsyncSessionLocal, engine, init_db  # noqa: E402
+from app.models import AuditLog  # noqa: E402
+from app.routers.analytics import get_timeline_data  # noqa: E402
+
+
+def _load(levels):
+    """Replace audit_logs with one log per level, spread over the last hour"""
+    init_db()
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": f"log-{index}",
+            "timestamp": now - timedelta(seconds=1 + index * 3500 // len(levels)),
+            "level": level,
+            "event_type": "USER_LOGIN",
+            "message": "timeline test",
+            "hospital_id": "hospital-1",
+        }
+        for index, level in enumerate(levels)
+    ]
+    with engine.begin() as connection:
+        connection.execute(delete(AuditLog))
+        connection.execute(insert(AuditLog), rows)
+
+
+def _timeline(max_points: int):
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await get_timeline_data(hospital_id=None, hours=1, max_points=max_points, db=db)
+    return asyncio.run(run())
+
+
+def test_one_bucket_left_for_the_rest():
+    # Kept events leave a budget of 1 for the other 200
+    _load(["ERROR"] * 9 + ["INFO"] * 200)
+    points = _timeline(max_points=10)
+    assert len(points) <= 10
+    assert sum(point["count"] for point in points) == 209
+
+
+def test_downsampled_within_max_points():
+    _load(["ERROR"] * 3 + ["INFO"] * 500)
+    for max_points in (10, 11, 17, 100):
+        points = _timeline(max_points)
+        assert len(points) <= max_points
+        assert sum(point["count"] for point in points) == 503